@@ -0,0 +1,183 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, jsonify, request
+
+from pagination import wants_page, wants_stream
+
+DEFAULT_COST = 'light'
+ENVIRON_KEY = 'admission.limiter'
+
+
+def listing():
+    # An unpaged or streamed list reads the whole table and holds its connection until the last row.
+    return 'standard' if wants_page() and not wants_stream() else 'heavy'
+
+
+def cost(value):
+    # value is a class name, a callable returning one per request, or None to bypass admission entirely.
+    def decorator(view):
+        view.admission_cost = value
+        return view
+    return decorator
+
+
+class Limiter:
+    def __init__(self, concurrency, queue, timeout):
+        self.concurrency = concurrency
+        self.queue = queue
+        self.timeout = timeout
+        self.condition = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.shed = {'queue_full': 0, 'timeout': 0}
+
+    def acquire(self):
+        with self.condition:
+            if self.active < self.concurrency:
+                self.active += 1
+                self.admitted += 1
+                return None
+            if self.waiting >= self.queue:
+                self.shed['queue_full'] += 1
+                return 'queue_full'
+
+            self.waiting += 1
+            deadline = time.monotonic() + self.timeout
+            try:
+                while self.active >= self.concurrency:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.shed['timeout'] += 1
+                        return 'timeout'
+                    self.condition.wait(remaining)
+            finally:
+                self.waiting -= 1
+            self.active += 1
+            self.admitted += 1
+            return None
+
+    def release(self):
+        with self.condition:
+            self.active -= 1
+            self.condition.notify()
+
+
+class TokenBuckets:
+    def __init__(self, rate, burst, max_clients):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self.buckets = OrderedDict()
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    def take(self, client, tokens):
+        # Returns 0 when the request may proceed, otherwise the seconds until enough tokens refill.
+        now = time.monotonic()
+        with self.lock:
+            available, updated = self.buckets.pop(client, (self.burst, now))
+            available = min(self.burst, available + (now - updated) * self.rate)
+            wait = 0.0
+            if available >= tokens:
+                available -= tokens
+            else:
+                wait = (min(tokens, self.burst) - available) / self.rate
+                self.rejected += 1
+            # Least recently seen clients fall out first; they come back with a full bucket.
+            self.buckets[client] = (available, now)
+            while len(self.buckets) > self.max_clients:
+                self.buckets.popitem(last=False)
+            return wait
+
+
+class Admission:
+    def __init__(self, config):
+        self.classes = config['ADMISSION_CLASSES']
+        self.limiters = {name: Limiter(spec['concurrency'], spec['queue'], spec['timeout']) for name, spec in self.classes.items()}
+        rate = config['RATE_LIMIT_PER_SECOND']
+        self.buckets = TokenBuckets(rate, config['RATE_LIMIT_BURST'], config['RATE_LIMIT_MAX_CLIENTS']) if rate > 0 else None
+        self.retry_after = config['ADMISSION_RETRY_AFTER']
+
+
+def get_admission():
+    admission = current_app.extensions.get('admission')
+    if admission is None:
+        admission = current_app.extensions['admission'] = Admission(current_app.config)
+    return admission
+
+
+def cost_class(view):
+    value = getattr(view, 'admission_cost', DEFAULT_COST)
+    return value() if callable(value) else value
+
+
+def _reject(message, status, retry_after):
+    response = jsonify({'message': message})
+    response.status_code = status
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def _before_request():
+    if not current_app.config['ADMISSION_ENABLED']:
+        return None
+    name = cost_class(current_app.view_functions.get(request.endpoint))
+    if name is None:
+        return None
+
+    admission = get_admission()
+    if admission.buckets is not None:
+        # Nothing here authenticates callers, so a client-supplied key would let anyone mint fresh buckets.
+        # Behind proxies this is the proxy's address unless PROXY_FIX_X_FOR has it read from X-Forwarded-For.
+        client = request.remote_addr or 'anonymous'
+        wait = admission.buckets.take(client, admission.classes[name]['tokens'])
+        if wait:
+            return _reject('Demasiadas peticiones, reintente más tarde', 429, wait)
+
+    limiter = admission.limiters[name]
+    if limiter.acquire() is not None:
+        return _reject('Servicio saturado, reintente más tarde', 503, admission.retry_after)
+    # Kept on this request's environ rather than g: /batch sub-requests share g but get their own environ,
+    # so their teardown cannot release the slot the batch still holds.
+    request.environ[ENVIRON_KEY] = limiter
+    return None
+
+
+def _teardown_request(error):
+    limiter = request.environ.pop(ENVIRON_KEY, None)
+    if limiter is not None:
+        limiter.release()
+
+
+def render():
+    admission = current_app.extensions.get('admission')
+    if admission is None:
+        return ''
+    lines = ['# HELP admission_in_flight Requests currently holding a slot of their cost class',
+             '# TYPE admission_in_flight gauge']
+    limiters = sorted(admission.limiters.items())
+    for name, limiter in limiters:
+        lines.append(f'admission_in_flight{{class="{name}"}} {limiter.active}')
+    lines += ['# HELP admission_queue_depth Requests waiting for a slot of their cost class', '# TYPE admission_queue_depth gauge']
+    for name, limiter in limiters:
+        lines.append(f'admission_queue_depth{{class="{name}"}} {limiter.waiting}')
+    lines += ['# HELP admission_admitted_total Requests admitted per cost class', '# TYPE admission_admitted_total counter']
+    for name, limiter in limiters:
+        lines.append(f'admission_admitted_total{{class="{name}"}} {limiter.admitted}')
+    lines += ['# HELP admission_shed_total Requests rejected with 503 per cost class', '# TYPE admission_shed_total counter']
+    for name, limiter in limiters:
+        for reason, count in sorted(limiter.shed.items()):
+            lines.append(f'admission_shed_total{{class="{name}",reason="{reason}"}} {count}')
+    lines += ['# HELP rate_limit_rejected_total Requests rejected with 429 by the per-client token buckets',
+              '# TYPE rate_limit_rejected_total counter',
+              f'rate_limit_rejected_total {admission.buckets.rejected if admission.buckets is not None else 0}']
+    return '\n'.join(lines) + '\n'
+
+
+def init_app(app):
+    app.before_request(_before_request)
+    app.teardown_request(_teardown_request)
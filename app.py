@@ -1,15 +1,65 @@
-from flask import Flask, jsonify, request
-from models import db, User, Post, Follow, Customer, Product, Category, ProductCategoryMap, Order, OrderItem, Shipment, Warehouse, ShipmentItem, ProductReview
+from flask import Flask, Response, jsonify, request
+from sqlalchemy.exc import StatementError
+from sqlalchemy.orm.exc import StaleDataError
+from werkzeug.middleware.proxy_fix import ProxyFix
+import admission
+import archive
+import batch
+import cascade
+import category_tree
+import change_log
+import filters
+import guids
+import metrics
+import product_stats
+import response_cache
+import search
+import serializers
+from bulk import bulk_insert
+from feed import load_feed
+from fulfillment import load_fulfillment, load_unfulfilled
+from order_graph import load_orders, parse_ids, serialize_order
+from pagination import InvalidCursor, list_response, page_limit
+from patch import patch_update
+from models import db, InvalidGUID, User, Post, Follow, Customer, Product, Category, ProductCategoryMap, Order, OrderItem, Shipment, Warehouse, ShipmentItem, ProductReview
 
 app = Flask(__name__)
 app.config.from_object('config.Config')
+app.json_encoder = serializers.JSONEncoder
+if app.config['PROXY_FIX_X_FOR']:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'])
 db.init_app(app)
+metrics.init_app(app)
+admission.init_app(app)
+product_stats.init_app(app)
+change_log.init_app(app)
+guids.init_app(app)
+archive.init_app(app)
+filters.warn_unindexed()
+
+# Versioned rows that changed between load and flush fail like a stale If-Match.
+@app.errorhandler(StaleDataError)
+def handle_stale_data(error):
+    db.session.rollback()
+    return jsonify({'message': 'El recurso fue modificado por otra petición'}), 412
+
+@app.errorhandler(StatementError)
+def handle_statement_error(error):
+    if not isinstance(error.orig, InvalidGUID):
+        raise error
+    db.session.rollback()
+    return jsonify({'message': 'GUID inválido'}), 400
+
+@app.errorhandler(product_stats.InvalidCounter)
+def handle_invalid_counter(error):
+    db.session.rollback()
+    return jsonify({'message': 'Cantidad inválida'}), 400
 
 # ----- USERS -----
 @app.route('/users', methods=['GET'])
+@admission.cost(admission.listing)
 def get_users():
-    users = User.query.all()
-    return jsonify([{'user_id': user.user_id, 'username': user.username, 'role': user.role, 'created_at': user.created_at} for user in users])
+    return list_response(User)
 
 @app.route('/users', methods=['POST'])
 def add_user():
@@ -17,7 +67,7 @@ def add_user():
     new_user = User(username=data['username'], role=data.get('role', ''))
     db.session.add(new_user)
     db.session.commit()
-    return jsonify({'message': 'Nuevo usuario creado'}), 201
+    return jsonify({'message': 'Nuevo usuario creado', 'user_id': new_user.user_id}), 201
 
 @app.route('/users/<int:id>', methods=['PUT'])
 def update_user(id):
@@ -31,6 +81,10 @@ def update_user(id):
     db.session.commit()
     return jsonify({'message': 'Usuario actualizado'})
 
+@app.route('/users/<int:id>', methods=['PATCH'])
+def patch_user(id):
+    return patch_update(User, id, ('username', 'role'), 'Usuario no encontrado', 'Usuario actualizado')
+
 @app.route('/users/<int:id>', methods=['DELETE'])
 def delete_user(id):
     user = User.query.get(id)
@@ -43,9 +97,9 @@ def delete_user(id):
 
 # ----- POSTS -----
 @app.route('/posts', methods=['GET'])
+@admission.cost(admission.listing)
 def get_posts():
-    posts = Post.query.all()
-    return jsonify([{'post_id': post.post_id, 'title': post.title, 'body': post.body, 'user_id': post.user_id, 'status': post.status, 'created_at': post.created_at} for post in posts])
+    return list_response(Post)
 
 @app.route('/posts', methods=['POST'])
 def add_post():
@@ -53,7 +107,7 @@ def add_post():
     new_post = Post(title=data['title'], body=data['body'], user_id=data['user_id'], status=data['status'])
     db.session.add(new_post)
     db.session.commit()
-    return jsonify({'message': 'Nueva publicación creada'}), 201
+    return jsonify({'message': 'Nueva publicación creada', 'post_id': new_post.post_id}), 201
 
 @app.route('/posts/<int:id>', methods=['PUT'])
 def update_post(id):
@@ -68,6 +122,10 @@ def update_post(id):
     db.session.commit()
     return jsonify({'message': 'Publicación actualizada'})
 
+@app.route('/posts/<int:id>', methods=['PATCH'])
+def patch_post(id):
+    return patch_update(Post, id, ('title', 'body', 'status'), 'Publicación no encontrada', 'Publicación actualizada')
+
 @app.route('/posts/<int:id>', methods=['DELETE'])
 def delete_post(id):
     post = Post.query.get(id)
@@ -80,9 +138,9 @@ def delete_post(id):
 
 # ----- FOLLOWS -----
 @app.route('/follows', methods=['GET'])
+@admission.cost(admission.listing)
 def get_follows():
-    follows = Follow.query.all()
-    return jsonify([{'following_user_id': follow.following_user_id, 'followed_user_id': follow.followed_user_id, 'created_at': follow.created_at} for follow in follows])
+    return list_response(Follow)
 
 @app.route('/follows', methods=['POST'])
 def add_follow():
@@ -102,11 +160,25 @@ def delete_follow(following_user_id, followed_user_id):
     db.session.commit()
     return jsonify({'message': 'Relación eliminada'})
 
+# ----- FEED -----
+@app.route('/users/<int:id>/feed', methods=['GET'])
+@admission.cost('standard')
+def get_user_feed(id):
+    if not User.query.get(id):
+        return jsonify({'message': 'Usuario no encontrado'}), 404
+
+    try:
+        posts, next_cursor = load_feed(id, page_limit(), request.args.get('cursor'))
+    except InvalidCursor:
+        return jsonify({'message': 'Cursor inválido'}), 400
+    serializer = serializers.get_serializer(Post)
+    return serializers.json_response({'items': [serializer.dump(post) for post in posts], 'next_cursor': next_cursor})
+
 # ----- CUSTOMERS -----
 @app.route('/customers', methods=['GET'])
+@admission.cost(admission.listing)
 def get_customers():
-    customers = Customer.query.all()
-    return jsonify([{'customer_id': customer.customer_id, 'username': customer.username, 'email': customer.email} for customer in customers])
+    return list_response(Customer)
 
 @app.route('/customers', methods=['POST'])
 def add_customer():
@@ -114,7 +186,16 @@ def add_customer():
     new_customer = Customer(customer_guid=data['customer_guid'], username=data['username'], email=data['email'])
     db.session.add(new_customer)
     db.session.commit()
-    return jsonify({'message': 'Nuevo cliente creado'}), 201
+    return jsonify({'message': 'Nuevo cliente creado', 'customer_id': new_customer.customer_id}), 201
+
+@app.route('/customers/by-guid', methods=['GET'])
+@admission.cost('standard')
+def get_customers_by_guid():
+    return guids.guid_response(Customer, 'Cliente no encontrado')
+
+@app.route('/customers/by-guid/<guid>', methods=['GET'])
+def get_customer_by_guid(guid):
+    return guids.guid_response(Customer, 'Cliente no encontrado', guid)
 
 @app.route('/customers/<int:id>', methods=['PUT'])
 def update_customer(id):
@@ -128,21 +209,44 @@ def update_customer(id):
     db.session.commit()
     return jsonify({'message': 'Cliente actualizado'})
 
+@app.route('/customers/<int:id>', methods=['PATCH'])
+def patch_customer(id):
+    return patch_update(Customer, id, ('username', 'email'), 'Cliente no encontrado', 'Cliente actualizado')
+
 @app.route('/customers/<int:id>', methods=['DELETE'])
 def delete_customer(id):
-    customer = Customer.query.get(id)
-    if not customer:
+    deleted = cascade.delete(db.session, Customer, [id])
+    if not deleted:
         return jsonify({'message': 'Cliente no encontrado'}), 404
 
-    db.session.delete(customer)
     db.session.commit()
+    for review_id in deleted.get(ProductReview, ()):
+        search.remove('review', review_id)
     return jsonify({'message': 'Cliente eliminado'})
 
 # ----- PRODUCTS -----
 @app.route('/products', methods=['GET'])
+@admission.cost('standard')
+@response_cache.cached('products')
 def get_products():
-    products = Product.query.all()
-    return jsonify([{'product_id': product.product_id, 'name': product.name, 'short_description': product.short_description} for product in products])
+    return list_response(Product)
+
+@app.route('/products/top', methods=['GET'])
+def get_top_products():
+    by = request.args.get('by', 'sales')
+    if by not in product_stats.RANKINGS:
+        return jsonify({'message': 'Parámetro by inválido'}), 400
+
+    category_ids = None
+    if 'category_id' in request.args:
+        category_id = request.args.get('category_id', type=int)
+        tree = category_tree.get_tree()
+        if category_id not in tree:
+            return jsonify({'message': 'Categoría no encontrada'}), 404
+        category_ids = tree.descendants(category_id) if request.args.get('recursive') == '1' else [category_id]
+
+    limit = max(1, min(request.args.get('limit', 20, type=int), app.config['PAGE_SIZE_MAX']))
+    return jsonify(product_stats.top(by, limit, category_ids))
 
 @app.route('/products', methods=['POST'])
 def add_product():
@@ -150,7 +254,9 @@ def add_product():
     new_product = Product(product_type_id=data['product_type_id'], name=data['name'], short_description=data.get('short_description', ''))
     db.session.add(new_product)
     db.session.commit()
-    return jsonify({'message': 'Nuevo producto creado'}), 201
+    search.index_product(new_product)
+    response_cache.invalidate('products', 'categories')
+    return jsonify({'message': 'Nuevo producto creado', 'product_id': new_product.product_id}), 201
 
 @app.route('/products/<int:id>', methods=['PUT'])
 def update_product(id):
@@ -162,8 +268,18 @@ def update_product(id):
     product.name = data['name']
     product.short_description = data.get('short_description', product.short_description)
     db.session.commit()
+    search.index_product(product)
+    response_cache.invalidate('products', 'categories')
     return jsonify({'message': 'Producto actualizado'})
 
+@app.route('/products/<int:id>', methods=['PATCH'])
+def patch_product(id):
+    response = patch_update(Product, id, ('name', 'short_description'), 'Producto no encontrado', 'Producto actualizado')
+    if response.status_code == 200:
+        search.index_product(Product.query.get(id))
+        response_cache.invalidate('products', 'categories')
+    return response
+
 @app.route('/products/<int:id>', methods=['DELETE'])
 def delete_product(id):
     product = Product.query.get(id)
@@ -172,21 +288,55 @@ def delete_product(id):
 
     db.session.delete(product)
     db.session.commit()
+    search.remove('product', id)
+    response_cache.invalidate('products', 'categories')
     return jsonify({'message': 'Producto eliminado'})
 
 # ----- CATEGORIES -----
 @app.route('/categories', methods=['GET'])
+@admission.cost('standard')
+@response_cache.cached('categories')
 def get_categories():
-    categories = Category.query.all()
-    return jsonify([{'category_id': category.category_id, 'meta_title': category.meta_title, 'meta_description': category.meta_description} for category in categories])
+    return list_response(Category)
 
 @app.route('/categories', methods=['POST'])
 def add_category():
     data = request.get_json()
-    new_category = Category(meta_title=data['meta_title'], meta_description=data['meta_description'])
+    new_category = Category(meta_title=data['meta_title'], meta_description=data['meta_description'], parent_category_id=data.get('parent_category_id'))
     db.session.add(new_category)
     db.session.commit()
-    return jsonify({'message': 'Nueva categoría creada'}), 201
+    category_tree.invalidate()
+    response_cache.invalidate('categories')
+    return jsonify({'message': 'Nueva categoría creada', 'category_id': new_category.category_id}), 201
+
+@app.route('/categories/tree', methods=['GET'])
+@admission.cost('standard')
+@response_cache.cached('categories')
+def get_category_tree():
+    return app.response_class(category_tree.dumps(category_tree.get_tree().as_tree()), mimetype='application/json')
+
+@app.route('/categories/<int:id>/products', methods=['GET'])
+@admission.cost('standard')
+@response_cache.cached('categories')
+def get_category_products(id):
+    tree = category_tree.get_tree()
+    if id not in tree:
+        return jsonify({'message': 'Categoría no encontrada'}), 404
+
+    category_ids = tree.descendants(id) if request.args.get('recursive') == '1' else [id]
+    rows = (db.session.query(ProductCategoryMap, Product)
+            .join(Product, ProductCategoryMap.product_id == Product.product_id)
+            .filter(ProductCategoryMap.category_id.in_(category_ids))
+            .order_by(ProductCategoryMap.display_order, ProductCategoryMap.map_id)
+            .all())
+    seen = set()
+    products = []
+    for mapping, product in rows:
+        if product.product_id in seen:
+            continue
+        seen.add(product.product_id)
+        products.append({'product_id': product.product_id, 'name': product.name, 'short_description': product.short_description, 'category_id': mapping.category_id, 'is_featured_product': mapping.is_featured_product, 'display_order': mapping.display_order})
+    return jsonify(products)
 
 @app.route('/categories/<int:id>', methods=['PUT'])
 def update_category(id):
@@ -197,9 +347,20 @@ def update_category(id):
 
     category.meta_title = data['meta_title']
     category.meta_description = data['meta_description']
+    category.parent_category_id = data.get('parent_category_id', category.parent_category_id)
     db.session.commit()
+    category_tree.invalidate()
+    response_cache.invalidate('categories')
     return jsonify({'message': 'Categoría actualizada'})
 
+@app.route('/categories/<int:id>', methods=['PATCH'])
+def patch_category(id):
+    response = patch_update(Category, id, ('meta_title', 'meta_description', 'parent_category_id'), 'Categoría no encontrada', 'Categoría actualizada')
+    if response.status_code == 200:
+        category_tree.invalidate()
+        response_cache.invalidate('categories')
+    return response
+
 @app.route('/categories/<int:id>', methods=['DELETE'])
 def delete_category(id):
     category = Category.query.get(id)
@@ -208,13 +369,23 @@ def delete_category(id):
 
     db.session.delete(category)
     db.session.commit()
+    category_tree.invalidate()
+    response_cache.invalidate('categories')
     return jsonify({'message': 'Categoría eliminada'})
 
+# ----- PRODUCT CATEGORY MAP -----
+@app.route('/product_category_map/bulk', methods=['POST'])
+@admission.cost('heavy')
+def add_product_category_map_bulk():
+    response = bulk_insert(ProductCategoryMap, ('product_id', 'category_id'), ('is_featured_product', 'display_order'))
+    response_cache.invalidate('categories')
+    return response
+
 # ----- ORDERS -----
 @app.route('/orders', methods=['GET'])
+@admission.cost(admission.listing)
 def get_orders():
-    orders = Order.query.all()
-    return jsonify([{'order_id': order.order_id, 'customer_id': order.customer_id, 'order_guid': order.order_guid} for order in orders])
+    return list_response(Order)
 
 @app.route('/orders', methods=['POST'])
 def add_order():
@@ -222,7 +393,51 @@ def add_order():
     new_order = Order(order_guid=data['order_guid'], store_id=data['store_id'], customer_id=data['customer_id'], billing_address_id=data['billing_address_id'], shipping_address_id=data['shipping_address_id'])
     db.session.add(new_order)
     db.session.commit()
-    return jsonify({'message': 'Nuevo pedido creado'}), 201
+    return jsonify({'message': 'Nuevo pedido creado', 'order_id': new_order.order_id}), 201
+
+@app.route('/orders/by-guid', methods=['GET'])
+@admission.cost('standard')
+def get_orders_by_guid():
+    return guids.guid_response(Order, 'Pedido no encontrado', archived=request.args.get('archived') == '1')
+
+@app.route('/orders/by-guid/<guid>', methods=['GET'])
+def get_order_by_guid(guid):
+    return guids.guid_response(Order, 'Pedido no encontrado', guid, request.args.get('archived') == '1')
+
+@app.route('/orders/full', methods=['GET'])
+@admission.cost('heavy')
+def get_orders_full():
+    ids = parse_ids(request.args.get('ids', ''), app.config['PAGE_SIZE_MAX'])
+    if ids is None:
+        return jsonify({'message': 'Parámetro ids inválido'}), 400
+
+    return jsonify([serialize_order(order) for order in load_orders(ids, request.args.get('archived') == '1')])
+
+@app.route('/orders/fulfillment', methods=['GET'])
+@admission.cost('heavy')
+def get_orders_fulfillment():
+    ids = parse_ids(request.args.get('ids', ''), app.config['PAGE_SIZE_MAX'])
+    if ids is None:
+        return jsonify({'message': 'Parámetro ids inválido'}), 400
+
+    return jsonify(load_fulfillment(ids, request.args.get('archived') == '1'))
+
+@app.route('/orders/unfulfilled', methods=['GET'])
+@admission.cost('heavy')
+def get_orders_unfulfilled():
+    try:
+        orders, next_cursor = load_unfulfilled(page_limit(), request.args.get('cursor'))
+    except InvalidCursor:
+        return jsonify({'message': 'Cursor inválido'}), 400
+    return jsonify({'items': orders, 'next_cursor': next_cursor})
+
+@app.route('/orders/<int:id>/full', methods=['GET'])
+def get_order_full(id):
+    orders = load_orders([id], request.args.get('archived') == '1')
+    if not orders:
+        return jsonify({'message': 'Pedido no encontrado'}), 404
+
+    return jsonify(serialize_order(orders[0]))
 
 @app.route('/orders/<int:id>', methods=['PUT'])
 def update_order(id):
@@ -236,21 +451,23 @@ def update_order(id):
     db.session.commit()
     return jsonify({'message': 'Pedido actualizado'})
 
+@app.route('/orders/<int:id>', methods=['PATCH'])
+def patch_order(id):
+    return patch_update(Order, id, ('billing_address_id', 'shipping_address_id'), 'Pedido no encontrado', 'Pedido actualizado')
+
 @app.route('/orders/<int:id>', methods=['DELETE'])
 def delete_order(id):
-    order = Order.query.get(id)
-    if not order:
+    if not cascade.delete(db.session, Order, [id]):
         return jsonify({'message': 'Pedido no encontrado'}), 404
 
-    db.session.delete(order)
     db.session.commit()
     return jsonify({'message': 'Pedido eliminado'})
 
 # ----- ORDER ITEMS -----
 @app.route('/order_items', methods=['GET'])
+@admission.cost(admission.listing)
 def get_order_items():
-    order_items = OrderItem.query.all()
-    return jsonify([{'order_item_id': item.order_item_id, 'order_id': item.order_id, 'product_id': item.product_id, 'quantity': item.quantity} for item in order_items])
+    return list_response(OrderItem)
 
 @app.route('/order_items', methods=['POST'])
 def add_order_item():
@@ -258,7 +475,21 @@ def add_order_item():
     new_order_item = OrderItem(order_item_guid=data['order_item_guid'], order_id=data['order_id'], product_id=data['product_id'], quantity=data['quantity'])
     db.session.add(new_order_item)
     db.session.commit()
-    return jsonify({'message': 'Nuevo item de pedido creado'}), 201
+    return jsonify({'message': 'Nuevo item de pedido creado', 'order_item_id': new_order_item.order_item_id}), 201
+
+@app.route('/order_items/bulk', methods=['POST'])
+@admission.cost('heavy')
+def add_order_items_bulk():
+    return bulk_insert(OrderItem, ('order_item_guid', 'order_id', 'product_id', 'quantity'))
+
+@app.route('/order_items/by-guid', methods=['GET'])
+@admission.cost('standard')
+def get_order_items_by_guid():
+    return guids.guid_response(OrderItem, 'Item de pedido no encontrado', archived=request.args.get('archived') == '1')
+
+@app.route('/order_items/by-guid/<guid>', methods=['GET'])
+def get_order_item_by_guid(guid):
+    return guids.guid_response(OrderItem, 'Item de pedido no encontrado', guid, request.args.get('archived') == '1')
 
 @app.route('/order_items/<int:id>', methods=['PUT'])
 def update_order_item(id):
@@ -271,21 +502,23 @@ def update_order_item(id):
     db.session.commit()
     return jsonify({'message': 'Item de pedido actualizado'})
 
+@app.route('/order_items/<int:id>', methods=['PATCH'])
+def patch_order_item(id):
+    return patch_update(OrderItem, id, ('quantity',), 'Item de pedido no encontrado', 'Item de pedido actualizado')
+
 @app.route('/order_items/<int:id>', methods=['DELETE'])
 def delete_order_item(id):
-    order_item = OrderItem.query.get(id)
-    if not order_item:
+    if not cascade.delete(db.session, OrderItem, [id]):
         return jsonify({'message': 'Item de pedido no encontrado'}), 404
 
-    db.session.delete(order_item)
     db.session.commit()
     return jsonify({'message': 'Item de pedido eliminado'})
 
 # ----- SHIPMENTS -----
 @app.route('/shipments', methods=['GET'])
+@admission.cost(admission.listing)
 def get_shipments():
-    shipments = Shipment.query.all()
-    return jsonify([{'shipment_id': shipment.shipment_id, 'order_id': shipment.order_id, 'tracking_number': shipment.tracking_number, 'total_weight': float(shipment.total_weight), 'shipped_date_utc': shipment.shipped_date_utc} for shipment in shipments])
+    return list_response(Shipment)
 
 @app.route('/shipments', methods=['POST'])
 def add_shipment():
@@ -293,7 +526,7 @@ def add_shipment():
     new_shipment = Shipment(order_id=data['order_id'], tracking_number=data['tracking_number'], total_weight=data['total_weight'], shipped_date_utc=data['shipped_date_utc'])
     db.session.add(new_shipment)
     db.session.commit()
-    return jsonify({'message': 'Nuevo envío creado'}), 201
+    return jsonify({'message': 'Nuevo envío creado', 'shipment_id': new_shipment.shipment_id}), 201
 
 @app.route('/shipments/<int:id>', methods=['PUT'])
 def update_shipment(id):
@@ -308,21 +541,24 @@ def update_shipment(id):
     db.session.commit()
     return jsonify({'message': 'Envío actualizado'})
 
+@app.route('/shipments/<int:id>', methods=['PATCH'])
+def patch_shipment(id):
+    return patch_update(Shipment, id, ('tracking_number', 'total_weight', 'shipped_date_utc'), 'Envío no encontrado', 'Envío actualizado')
+
 @app.route('/shipments/<int:id>', methods=['DELETE'])
 def delete_shipment(id):
-    shipment = Shipment.query.get(id)
-    if not shipment:
+    if not cascade.delete(db.session, Shipment, [id]):
         return jsonify({'message': 'Envío no encontrado'}), 404
 
-    db.session.delete(shipment)
     db.session.commit()
     return jsonify({'message': 'Envío eliminado'})
 
 # ----- WAREHOUSES -----
 @app.route('/warehouses', methods=['GET'])
+@admission.cost('standard')
+@response_cache.cached('warehouses')
 def get_warehouses():
-    warehouses = Warehouse.query.all()
-    return jsonify([{'warehouse_id': warehouse.warehouse_id, 'name': warehouse.name, 'admin_comment': warehouse.admin_comment} for warehouse in warehouses])
+    return list_response(Warehouse)
 
 @app.route('/warehouses', methods=['POST'])
 def add_warehouse():
@@ -330,7 +566,8 @@ def add_warehouse():
     new_warehouse = Warehouse(name=data['name'], admin_comment=data['admin_comment'])
     db.session.add(new_warehouse)
     db.session.commit()
-    return jsonify({'message': 'Nuevo almacén creado'}), 201
+    response_cache.invalidate('warehouses')
+    return jsonify({'message': 'Nuevo almacén creado', 'warehouse_id': new_warehouse.warehouse_id}), 201
 
 @app.route('/warehouses/<int:id>', methods=['PUT'])
 def update_warehouse(id):
@@ -342,8 +579,16 @@ def update_warehouse(id):
     warehouse.name = data['name']
     warehouse.admin_comment = data['admin_comment']
     db.session.commit()
+    response_cache.invalidate('warehouses')
     return jsonify({'message': 'Almacén actualizado'})
 
+@app.route('/warehouses/<int:id>', methods=['PATCH'])
+def patch_warehouse(id):
+    response = patch_update(Warehouse, id, ('name', 'admin_comment'), 'Almacén no encontrado', 'Almacén actualizado')
+    if response.status_code == 200:
+        response_cache.invalidate('warehouses')
+    return response
+
 @app.route('/warehouses/<int:id>', methods=['DELETE'])
 def delete_warehouse(id):
     warehouse = Warehouse.query.get(id)
@@ -352,13 +597,14 @@ def delete_warehouse(id):
 
     db.session.delete(warehouse)
     db.session.commit()
+    response_cache.invalidate('warehouses')
     return jsonify({'message': 'Almacén eliminado'})
 
 # ----- SHIPMENT ITEMS -----
 @app.route('/shipment_items', methods=['GET'])
+@admission.cost(admission.listing)
 def get_shipment_items():
-    shipment_items = ShipmentItem.query.all()
-    return jsonify([{'shipment_item_id': item.shipment_item_id, 'shipment_id': item.shipment_id, 'order_item_id': item.order_item_id, 'warehouse_id': item.warehouse_id} for item in shipment_items])
+    return list_response(ShipmentItem)
 
 @app.route('/shipment_items', methods=['POST'])
 def add_shipment_item():
@@ -366,7 +612,12 @@ def add_shipment_item():
     new_shipment_item = ShipmentItem(shipment_id=data['shipment_id'], order_item_id=data['order_item_id'], warehouse_id=data['warehouse_id'])
     db.session.add(new_shipment_item)
     db.session.commit()
-    return jsonify({'message': 'Nuevo item de envío creado'}), 201
+    return jsonify({'message': 'Nuevo item de envío creado', 'shipment_item_id': new_shipment_item.shipment_item_id}), 201
+
+@app.route('/shipment_items/bulk', methods=['POST'])
+@admission.cost('heavy')
+def add_shipment_items_bulk():
+    return bulk_insert(ShipmentItem, ('shipment_id', 'order_item_id', 'warehouse_id'))
 
 @app.route('/shipment_items/<int:id>', methods=['PUT'])
 def update_shipment_item(id):
@@ -380,6 +631,10 @@ def update_shipment_item(id):
     db.session.commit()
     return jsonify({'message': 'Item de envío actualizado'})
 
+@app.route('/shipment_items/<int:id>', methods=['PATCH'])
+def patch_shipment_item(id):
+    return patch_update(ShipmentItem, id, ('order_item_id', 'warehouse_id'), 'Item de envío no encontrado', 'Item de envío actualizado')
+
 @app.route('/shipment_items/<int:id>', methods=['DELETE'])
 def delete_shipment_item(id):
     shipment_item = ShipmentItem.query.get(id)
@@ -392,9 +647,9 @@ def delete_shipment_item(id):
 
 # ----- PRODUCT REVIEWS -----
 @app.route('/product_reviews', methods=['GET'])
+@admission.cost(admission.listing)
 def get_product_reviews():
-    reviews = ProductReview.query.all()
-    return jsonify([{'review_id': review.review_id, 'customer_id': review.customer_id, 'product_id': review.product_id, 'is_approved': review.is_approved, 'title': review.title, 'review_text': review.review_text} for review in reviews])
+    return list_response(ProductReview)
 
 @app.route('/product_reviews', methods=['POST'])
 def add_product_review():
@@ -402,7 +657,8 @@ def add_product_review():
     new_review = ProductReview(customer_id=data['customer_id'], product_id=data['product_id'], is_approved=data['is_approved'], title=data['title'], review_text=data['review_text'])
     db.session.add(new_review)
     db.session.commit()
-    return jsonify({'message': 'Nueva reseña de producto creada'}), 201
+    search.index_review(new_review)
+    return jsonify({'message': 'Nueva reseña de producto creada', 'review_id': new_review.review_id}), 201
 
 @app.route('/product_reviews/<int:id>', methods=['PUT'])
 def update_product_review(id):
@@ -415,8 +671,16 @@ def update_product_review(id):
     review.title = data['title']
     review.review_text = data['review_text']
     db.session.commit()
+    search.index_review(review)
     return jsonify({'message': 'Reseña actualizada'})
 
+@app.route('/product_reviews/<int:id>', methods=['PATCH'])
+def patch_product_review(id):
+    response = patch_update(ProductReview, id, ('is_approved', 'title', 'review_text'), 'Reseña no encontrada', 'Reseña actualizada')
+    if response.status_code == 200:
+        search.index_review(ProductReview.query.get(id))
+    return response
+
 @app.route('/product_reviews/<int:id>', methods=['DELETE'])
 def delete_product_review(id):
     review = ProductReview.query.get(id)
@@ -425,7 +689,57 @@ def delete_product_review(id):
 
     db.session.delete(review)
     db.session.commit()
+    search.remove('review', id)
     return jsonify({'message': 'Reseña eliminada'})
 
+# ----- SEARCH -----
+@app.route('/search', methods=['GET'])
+@admission.cost('standard')
+def search_catalog():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'message': 'Parámetro q requerido'}), 400
+    kind = request.args.get('type')
+    if kind not in (None, 'product', 'review'):
+        return jsonify({'message': 'Parámetro type inválido'}), 400
+
+    limit = max(1, min(request.args.get('limit', 20, type=int), app.config['PAGE_SIZE_MAX']))
+    index = search.get_index()
+    if index is None:
+        return jsonify({'message': 'Índice de búsqueda no disponible'}), 503
+    return jsonify(index.search(query, kind, limit))
+
+# ----- CHANGES -----
+@app.route('/changes', methods=['GET'])
+@admission.cost('standard')
+def get_changes():
+    since = request.args.get('since', type=int)
+    if since is None or since < 0:
+        return jsonify({'message': 'Parámetro since inválido'}), 400
+    tables = [table for table in request.args.get('tables', '').split(',') if table]
+    unknown = [table for table in tables if table not in change_log.TABLES]
+    if unknown:
+        return jsonify({'message': 'Tablas desconocidas: ' + ', '.join(unknown)}), 400
+
+    batch_size = app.config['CHANGE_LOG_BATCH_SIZE']
+    limit = max(1, min(request.args.get('limit', batch_size, type=int), batch_size))
+    try:
+        payload = change_log.load_changes(since, tables, limit)
+    except change_log.ChangesExpired:
+        return jsonify({'message': 'Los cambios solicitados ya no están disponibles, resincronice'}), 410
+    return serializers.json_response(payload)
+
+# ----- BATCH -----
+@app.route('/batch', methods=['POST'])
+@admission.cost(batch.cost)
+def post_batch():
+    return batch.run_batch()
+
+# ----- METRICS -----
+@app.route('/metrics', methods=['GET'])
+@admission.cost(None)
+def get_metrics():
+    return Response(metrics.render() + admission.render(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000)
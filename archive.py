@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import and_, exists, func, inspect, or_, select
+
+import change_log
+from models import (db, Order, OrderItem, Shipment, ShipmentItem,
+                    ArchivedOrder, ArchivedOrderItem, ArchivedShipment, ArchivedShipmentItem)
+
+# Parents first: archive rows are inserted in this order and hot rows deleted in reverse.
+MODELS = {Order: ArchivedOrder, OrderItem: ArchivedOrderItem, Shipment: ArchivedShipment, ShipmentItem: ArchivedShipmentItem}
+
+
+def _eligible(low, high, cutoff):
+    shipped_units = (select(func.count(ShipmentItem.shipment_item_id))
+                     .where(ShipmentItem.order_item_id == OrderItem.order_item_id)
+                     .scalar_subquery())
+    # A shipment item tying this order to another one would leave a dangling reference on either side.
+    crossing = (select(ShipmentItem.shipment_item_id)
+                .join(OrderItem, OrderItem.order_item_id == ShipmentItem.order_item_id)
+                .join(Shipment, Shipment.shipment_id == ShipmentItem.shipment_id)
+                .where(or_(OrderItem.order_id == Order.order_id, Shipment.order_id == Order.order_id),
+                       OrderItem.order_id != Shipment.order_id))
+    query = (select(Order.order_id)
+             .where(and_(Order.order_id > low, Order.order_id <= high))
+             .where(exists().where(Shipment.order_id == Order.order_id))
+             .where(~exists().where(Shipment.order_id == Order.order_id,
+                                    or_(Shipment.shipped_date_utc.is_(None), Shipment.shipped_date_utc >= cutoff)))
+             .where(~exists().where(OrderItem.order_id == Order.order_id, shipped_units < func.coalesce(OrderItem.quantity, 0)))
+             .where(~exists(crossing)))
+    return db.session.execute(query).scalars().all()
+
+
+def _selectors(order_ids):
+    shipment_ids = select(Shipment.shipment_id).where(Shipment.order_id.in_(order_ids))
+    return {
+        Order: Order.order_id.in_(order_ids),
+        OrderItem: OrderItem.order_id.in_(order_ids),
+        Shipment: Shipment.order_id.in_(order_ids),
+        ShipmentItem: ShipmentItem.shipment_id.in_(shipment_ids),
+    }
+
+
+def move(order_ids):
+    selectors = _selectors(order_ids)
+    for model, archived in MODELS.items():
+        # Logged as its own operation so change feed consumers don't take archived orders for deleted ones.
+        keys = db.session.execute(select(inspect(model).primary_key[0]).where(selectors[model])).scalars().all()
+        change_log.record(model, change_log.ARCHIVE, [(key,) for key in keys])
+        names = [column.name for column in model.__table__.columns]
+        db.session.execute(archived.__table__.insert().from_select(names, select(*model.__table__.columns).where(selectors[model])))
+    for model in reversed(list(MODELS)):
+        db.session.execute(model.__table__.delete().where(selectors[model]))
+
+
+def archive_orders(days=None):
+    cutoff = datetime.utcnow() - timedelta(days=current_app.config['ARCHIVE_AFTER_DAYS'] if days is None else days)
+    chunk = current_app.config['ARCHIVE_BATCH_SIZE']
+    highest = db.session.execute(select(func.max(Order.order_id))).scalar() or 0
+    archived = 0
+    low = 0
+    while low < highest:
+        high = low + chunk
+        order_ids = _eligible(low, high, cutoff)
+        if order_ids:
+            move(order_ids)
+            archived += len(order_ids)
+        # One transaction per PK range keeps locks short while the hot tables keep serving writes.
+        db.session.commit()
+        low = high
+    return archived
+
+
+cli = AppGroup('archive', help='Move historical orders out of the hot tables.')
+
+
+@cli.command('orders', help='Archive fully shipped orders whose last shipment is older than ARCHIVE_AFTER_DAYS.')
+@click.option('--days', type=int, default=None, help='Override ARCHIVE_AFTER_DAYS.')
+def archive_orders_command(days):
+    click.echo(f'{archive_orders(days)} pedidos archivados')
+
+
+def init_app(app):
+    app.cli.add_command(cli)
@@ -0,0 +1,256 @@
+import contextlib
+
+from sqlalchemy import select
+from sqlalchemy.exc import StatementError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm.exc import StaleDataError
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+import cascade
+# Imported for their session hooks: the change log and product_stats follow ORM writes here too.
+import change_log  # noqa: F401
+import product_stats
+from config import Config
+from models import InvalidGUID, User, Post, Follow, Customer, Product, Category, Order, OrderItem, Shipment, Warehouse, ShipmentItem, ProductReview
+from filters import InvalidFilter, parse_filters, parse_sort, warn_unindexed
+from pagination import InvalidCursor, cursor_for, keyset, order_by, sort_keys
+from serializers import InvalidFields, dumps, get_serializer
+
+REQUIRED = object()
+KEEP = object()
+STALE = 'El recurso fue modificado por otra petición'
+
+engine = create_async_engine(Config.ASYNC_DATABASE_URI, **Config.SQLALCHEMY_ENGINE_OPTIONS)
+Session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+class Resource:
+    def __init__(self, path, model, create, update, messages):
+        self.path = path
+        self.model = model
+        self.serializer = get_serializer(model)
+        self.create = create
+        self.update = update
+        self.created, self.updated, self.deleted, self.not_found = messages
+
+
+RESOURCES = [
+    Resource('users', User,
+             {'username': REQUIRED, 'role': ''}, {'username': REQUIRED, 'role': KEEP},
+             ('Nuevo usuario creado', 'Usuario actualizado', 'Usuario eliminado', 'Usuario no encontrado')),
+    Resource('posts', Post,
+             {'title': REQUIRED, 'body': REQUIRED, 'user_id': REQUIRED, 'status': REQUIRED}, {'title': REQUIRED, 'body': REQUIRED, 'status': REQUIRED},
+             ('Nueva publicación creada', 'Publicación actualizada', 'Publicación eliminada', 'Publicación no encontrada')),
+    Resource('follows', Follow,
+             {'following_user_id': REQUIRED, 'followed_user_id': REQUIRED}, None,
+             ('Nuevo seguidor añadido', None, 'Relación eliminada', 'Relación no encontrada')),
+    Resource('customers', Customer,
+             {'customer_guid': REQUIRED, 'username': REQUIRED, 'email': REQUIRED}, {'username': REQUIRED, 'email': REQUIRED},
+             ('Nuevo cliente creado', 'Cliente actualizado', 'Cliente eliminado', 'Cliente no encontrado')),
+    Resource('products', Product,
+             {'product_type_id': REQUIRED, 'name': REQUIRED, 'short_description': ''}, {'name': REQUIRED, 'short_description': KEEP},
+             ('Nuevo producto creado', 'Producto actualizado', 'Producto eliminado', 'Producto no encontrado')),
+    Resource('categories', Category,
+             {'meta_title': REQUIRED, 'meta_description': REQUIRED, 'parent_category_id': None},
+             {'meta_title': REQUIRED, 'meta_description': REQUIRED, 'parent_category_id': KEEP},
+             ('Nueva categoría creada', 'Categoría actualizada', 'Categoría eliminada', 'Categoría no encontrada')),
+    Resource('orders', Order,
+             {'order_guid': REQUIRED, 'store_id': REQUIRED, 'customer_id': REQUIRED, 'billing_address_id': REQUIRED, 'shipping_address_id': REQUIRED},
+             {'billing_address_id': REQUIRED, 'shipping_address_id': REQUIRED},
+             ('Nuevo pedido creado', 'Pedido actualizado', 'Pedido eliminado', 'Pedido no encontrado')),
+    Resource('order_items', OrderItem,
+             {'order_item_guid': REQUIRED, 'order_id': REQUIRED, 'product_id': REQUIRED, 'quantity': REQUIRED}, {'quantity': REQUIRED},
+             ('Nuevo item de pedido creado', 'Item de pedido actualizado', 'Item de pedido eliminado', 'Item de pedido no encontrado')),
+    Resource('shipments', Shipment,
+             {'order_id': REQUIRED, 'tracking_number': REQUIRED, 'total_weight': REQUIRED, 'shipped_date_utc': REQUIRED},
+             {'tracking_number': REQUIRED, 'total_weight': REQUIRED, 'shipped_date_utc': REQUIRED},
+             ('Nuevo envío creado', 'Envío actualizado', 'Envío eliminado', 'Envío no encontrado')),
+    Resource('warehouses', Warehouse,
+             {'name': REQUIRED, 'admin_comment': REQUIRED}, {'name': REQUIRED, 'admin_comment': REQUIRED},
+             ('Nuevo almacén creado', 'Almacén actualizado', 'Almacén eliminado', 'Almacén no encontrado')),
+    Resource('shipment_items', ShipmentItem,
+             {'shipment_id': REQUIRED, 'order_item_id': REQUIRED, 'warehouse_id': REQUIRED}, {'order_item_id': REQUIRED, 'warehouse_id': REQUIRED},
+             ('Nuevo item de envío creado', 'Item de envío actualizado', 'Item de envío eliminado', 'Item de envío no encontrado')),
+    Resource('product_reviews', ProductReview,
+             {'customer_id': REQUIRED, 'product_id': REQUIRED, 'is_approved': REQUIRED, 'title': REQUIRED, 'review_text': REQUIRED},
+             {'is_approved': REQUIRED, 'title': REQUIRED, 'review_text': REQUIRED},
+             ('Nueva reseña de producto creada', 'Reseña actualizada', 'Reseña eliminada', 'Reseña no encontrada')),
+]
+
+
+class APIResponse(JSONResponse):
+    def render(self, content):
+        return dumps(content)
+
+
+def _message(text, status_code=200, **extra):
+    return APIResponse({'message': text, **extra}, status_code=status_code)
+
+
+def _values(spec, data, current=None):
+    values = {}
+    for field, default in spec.items():
+        if field in data:
+            values[field] = data[field]
+        elif default is REQUIRED:
+            raise KeyError(field)
+        elif default is KEEP:
+            values[field] = getattr(current, field)
+        else:
+            values[field] = default
+    return values
+
+
+async def _json_body(request):
+    try:
+        data = await request.json()
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def list_view(resource):
+    serializer = resource.serializer
+
+    async def view(request):
+        params = request.query_params
+        try:
+            fields = serializer.parse_fields(params.get('fields'))
+        except InvalidFields as error:
+            return _message('Campos desconocidos: ' + ', '.join(error.args[0]), 400)
+        try:
+            criteria = parse_filters(serializer, params)
+            sort = parse_sort(serializer, params.get('sort'))
+        except InvalidFilter as error:
+            return _message('Filtro inválido: ' + error.args[0], 400)
+        query = select(*serializer.columns(fields, [name for name, _ in sort])).where(*criteria)
+        keys = sort_keys(serializer, sort)
+        page = 'limit' in params or 'cursor' in params
+        if page:
+            try:
+                limit = int(params.get('limit', Config.PAGE_SIZE_DEFAULT))
+            except ValueError:
+                limit = Config.PAGE_SIZE_DEFAULT
+            limit = max(1, min(limit, Config.PAGE_SIZE_MAX))
+            cursor = params.get('cursor')
+            if cursor:
+                try:
+                    query = query.where(keyset(serializer, keys, cursor))
+                except InvalidCursor:
+                    return _message('Cursor inválido', 400)
+            query = query.order_by(*order_by(serializer, keys)).limit(limit + 1)
+        elif sort:
+            query = query.order_by(*order_by(serializer, keys))
+
+        async with Session() as session:
+            rows = (await session.execute(query)).all()
+        if not page:
+            return APIResponse([dict(zip(fields, row)) for row in rows])
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = cursor_for(rows[-1], keys)
+        return APIResponse({'items': [dict(zip(fields, row)) for row in rows], 'next_cursor': next_cursor})
+    return view
+
+
+def create_view(resource):
+    async def view(request):
+        data = await _json_body(request)
+        if data is None:
+            return _message('Cuerpo JSON inválido', 400)
+        try:
+            values = _values(resource.create, data)
+        except KeyError as error:
+            return _message(f'Falta el campo {error.args[0]}', 400)
+
+        row = resource.model(**values)
+        async with Session() as session:
+            session.add(row)
+            try:
+                # Flushed first so the generated key is known, as the Flask routes return it.
+                await session.flush()
+                await session.commit()
+            except StatementError as error:
+                if not isinstance(error.orig, InvalidGUID):
+                    raise
+                return _message('GUID inválido', 400)
+            except product_stats.InvalidCounter:
+                return _message('Cantidad inválida', 400)
+        # Composite keys (follows) are the caller's own values, so only generated ones are echoed back.
+        key = resource.serializer.primary_key
+        return _message(resource.created, 201, **({key[0]: getattr(row, key[0])} if len(key) == 1 else {}))
+    return view
+
+
+def update_view(resource):
+    async def view(request):
+        data = await _json_body(request)
+        if data is None:
+            return _message('Cuerpo JSON inválido', 400)
+
+        async with Session() as session:
+            row = await session.get(resource.model, request.path_params['id'])
+            if row is None:
+                return _message(resource.not_found, 404)
+            try:
+                values = _values(resource.update, data, row)
+            except KeyError as error:
+                return _message(f'Falta el campo {error.args[0]}', 400)
+            for field, value in values.items():
+                setattr(row, field, value)
+            try:
+                await session.commit()
+            except product_stats.InvalidCounter:
+                return _message('Cantidad inválida', 400)
+            except StaleDataError:
+                # Another request changed the row's version between load and flush, as in the Flask app.
+                return _message(STALE, 412)
+        return _message(resource.updated)
+    return view
+
+
+def delete_view(resource):
+    async def view(request):
+        key = tuple(request.path_params.values())
+        async with Session() as session:
+            if resource.model in cascade.CHILDREN:
+                if not await session.run_sync(cascade.delete, resource.model, [key[0]]):
+                    return _message(resource.not_found, 404)
+            else:
+                row = await session.get(resource.model, key if len(key) > 1 else key[0])
+                if row is None:
+                    return _message(resource.not_found, 404)
+                await session.delete(row)
+            try:
+                await session.commit()
+            except StaleDataError:
+                return _message(STALE, 412)
+        return _message(resource.deleted)
+    return view
+
+
+def _routes():
+    routes = []
+    follows = next(resource for resource in RESOURCES if resource.model is Follow)
+    for resource in RESOURCES:
+        routes.append(Route(f'/{resource.path}', list_view(resource), methods=['GET']))
+        routes.append(Route(f'/{resource.path}', create_view(resource), methods=['POST']))
+        if resource.update is not None:
+            routes.append(Route(f'/{resource.path}/{{id:int}}', update_view(resource), methods=['PUT']))
+            routes.append(Route(f'/{resource.path}/{{id:int}}', delete_view(resource), methods=['DELETE']))
+    routes.append(Route('/follows/{following_user_id:int}/{followed_user_id:int}', delete_view(follows), methods=['DELETE']))
+    return routes
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    warn_unindexed()
+    yield
+    await engine.dispose()
+
+
+app = Starlette(routes=_routes(), lifespan=lifespan)
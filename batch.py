@@ -0,0 +1,155 @@
+import re
+from urllib.parse import urlsplit
+
+from flask import current_app, jsonify, request
+from werkzeug.exceptions import HTTPException
+
+import admission
+import category_tree
+import response_cache
+import search
+from models import db
+
+WRITE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+REFERENCE = re.compile(r'\$(\w+)\.(\w+)')
+# What each resource's handlers refresh, keyed by the first path segment.
+CACHES = {'products': ('products', 'categories'), 'categories': ('categories',),
+          'product_category_map': ('categories',), 'warehouses': ('warehouses',)}
+TREE = {'categories'}
+# Customer deletes drop their reviews from the index too.
+INDEXED = {'products', 'product_reviews', 'customers'}
+
+
+class InvalidReference(ValueError):
+    pass
+
+
+def _lookup(refs, name, field):
+    body = refs.get(name)
+    if not isinstance(body, dict) or field not in body:
+        raise InvalidReference(f'${name}.{field}')
+    return body[field]
+
+
+def _resolve(value, refs):
+    if isinstance(value, str):
+        match = REFERENCE.fullmatch(value)
+        return _lookup(refs, *match.groups()) if match else value
+    if isinstance(value, list):
+        return [_resolve(item, refs) for item in value]
+    if isinstance(value, dict):
+        return {key: _resolve(item, refs) for key, item in value.items()}
+    return value
+
+
+def _parse(operation):
+    if not isinstance(operation, dict):
+        return None
+    method = str(operation.get('method', '')).upper()
+    path = operation.get('path')
+    headers = operation.get('headers') or {}
+    if method not in WRITE_METHODS or not isinstance(path, str) or not path.startswith('/') or not isinstance(headers, dict):
+        return None
+    if urlsplit(path).path.rstrip('/') == '/batch':
+        return None
+    return method, path, operation.get('body'), headers
+
+
+def _dispatch(method, path, body, headers):
+    with current_app.test_request_context(path, method=method, json=body, headers=headers):
+        try:
+            response = current_app.make_response(current_app.dispatch_request())
+        except HTTPException as error:
+            response = error.get_response()
+        except Exception as error:
+            # Registered handlers (e.g. StaleDataError -> 412) still apply; anything else aborts the batch.
+            response = current_app.make_response(current_app.handle_user_exception(error))
+    return response.status_code, response.get_json(silent=True)
+
+
+def _resource(path):
+    return urlsplit(path).path.strip('/').split('/')[0]
+
+
+def _settle_side_effects(written, committed):
+    # Handlers refresh caches and indexes right after their (deferred) commit, so redo it now that the outcome is known.
+    if written & TREE:
+        category_tree.invalidate()
+    namespaces = {namespace for resource in written for namespace in CACHES.get(resource, ())}
+    if namespaces:
+        response_cache.invalidate(*sorted(namespaces))
+    if not committed and written & INDEXED:
+        search.invalidate()
+
+
+def cost():
+    operations = request.get_json(silent=True)
+    # Anything run_batch turns away before touching the database is costed like a single-row request.
+    if not isinstance(operations, list) or not operations or len(operations) > current_app.config['BATCH_MAX_OPERATIONS']:
+        return admission.DEFAULT_COST
+    adapter = current_app.url_map.bind(request.host)
+    tokens = 0
+    for operation in map(_parse, operations):
+        if operation is None:
+            return admission.DEFAULT_COST
+        method, path = operation[:2]
+        try:
+            endpoint, _ = adapter.match(urlsplit(REFERENCE.sub('0', path)).path, method=method)
+        except HTTPException:
+            continue
+        name = admission.cost_class(current_app.view_functions[endpoint])
+        if name is not None:
+            tokens += current_app.config['ADMISSION_CLASSES'][name]['tokens']
+    # The batch holds one slot for all its operations, so it takes the cheapest class whose tokens cover them.
+    classes = sorted(current_app.config['ADMISSION_CLASSES'].items(), key=lambda item: item[1]['tokens'])
+    return next((name for name, spec in classes if spec['tokens'] >= tokens), classes[-1][0])
+
+
+def run_batch():
+    operations = request.get_json()
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'message': 'Se esperaba una lista de operaciones'}), 400
+    if len(operations) > current_app.config['BATCH_MAX_OPERATIONS']:
+        return jsonify({'message': 'Demasiadas operaciones en un solo lote'}), 413
+    parsed = [_parse(operation) for operation in operations]
+    invalid = [index for index, operation in enumerate(parsed) if operation is None]
+    if invalid:
+        return jsonify({'message': 'Operaciones inválidas: ' + ', '.join(map(str, invalid))}), 400
+
+    session = db.session
+    session.info['defer_commit'] = True
+    refs, results = {}, []
+    written = set()
+    failed = None
+    try:
+        for index, (method, path, body, headers) in enumerate(parsed):
+            try:
+                path = REFERENCE.sub(lambda match: str(_lookup(refs, *match.groups())), path)
+                body = _resolve(body, refs)
+            except InvalidReference as error:
+                status, payload = 400, {'message': f'Referencia inválida: {error.args[0]}'}
+            else:
+                written.add(_resource(path))
+                status, payload = _dispatch(method, path, body, headers)
+            results.append({'status': status, 'body': payload})
+            if status >= 400:
+                failed = index
+                break
+            refs[str(index)] = payload
+            if isinstance(operations[index].get('ref'), str):
+                refs[operations[index]['ref']] = payload
+    except Exception:
+        session.info.pop('defer_commit', None)
+        session.rollback()
+        _settle_side_effects(written, False)
+        raise
+
+    session.info.pop('defer_commit', None)
+    if failed is not None:
+        session.rollback()
+        _settle_side_effects(written, False)
+        return jsonify({'message': f'Lote revertido: falló la operación {failed}', 'failed': failed, 'results': results}), results[failed]['status']
+
+    session.commit()
+    _settle_side_effects(written, True)
+    return jsonify({'message': f'{len(results)} operaciones aplicadas', 'results': results})
@@ -0,0 +1,499 @@
+import argparse
+import http.client
+import itertools
+import json
+import os
+import random
+import re
+import resource
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+from sqlalchemy import func
+
+import product_stats
+from models import db, User, Post, Follow, Customer, Product, Category, ProductCategoryMap, Order, OrderItem, Shipment, Warehouse, ShipmentItem, ProductReview
+from pagination import encode_cursor
+
+# Row counts at --scale 1.0.
+VOLUMES = {
+    'users': 20000,
+    'follows_per_user': 100,
+    'posts': 200000,
+    'customers': 100000,
+    'products': 50000,
+    'categories': 5000,
+    'product_category_map': 100000,
+    'orders': 1000000,
+    'items_per_order': 3,
+    'warehouses': 20,
+    'product_reviews': 300000,
+}
+WORDS = ('planta', 'flor', 'orquidea', 'helecho', 'cactus', 'semilla', 'maceta', 'tierra', 'abono', 'riego',
+         'sombra', 'sol', 'interior', 'exterior', 'colgante', 'rosa', 'tulipan', 'bonsai', 'suculenta', 'palmera')
+CHUNK_SIZE = 10000
+EPOCH = datetime(2024, 1, 1)
+# The ASGI entry point only serves the plain CRUD routes.
+ASGI_SCENARIO = re.compile(r'^(GET|POST|PUT|DELETE) /(users|posts|follows|customers|products|categories|orders|order_items|shipments'
+                           r'|warehouses|shipment_items|product_reviews)(/<id>|/<a>/<b>|\?\w+=)?$')
+
+
+def _volumes(scale):
+    counts = {name: max(1, int(value * scale)) for name, value in VOLUMES.items()}
+    counts['follows_per_user'] = min(VOLUMES['follows_per_user'], counts['users'] // 2)
+    counts['items_per_order'] = VOLUMES['items_per_order']
+    counts['warehouses'] = VOLUMES['warehouses']
+    return counts
+
+
+def _text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def _insert(table, rows):
+    chunk = []
+    total = 0
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK_SIZE:
+            db.session.execute(table.insert(), chunk)
+            db.session.commit()
+            total += len(chunk)
+            chunk = []
+    if chunk:
+        db.session.execute(table.insert(), chunk)
+        db.session.commit()
+        total += len(chunk)
+    print(f'  {table.name}: {total} rows', file=sys.stderr)
+
+
+def seed(counts, seed_value):
+    rng = random.Random(seed_value)
+    db.create_all(bind=None)
+    users, customers, products = counts['users'], counts['customers'], counts['products']
+    orders, categories = counts['orders'], counts['categories']
+    items_per_order = counts['items_per_order']
+
+    _insert(User.__table__, ({'user_id': i, 'username': f'user{i}', 'role': 'member'} for i in range(1, users + 1)))
+    _insert(Follow.__table__, ({'following_user_id': i, 'followed_user_id': (i + k - 1) % users + 1}
+                               for i in range(1, users + 1) for k in range(1, counts['follows_per_user'] + 1)))
+    _insert(Post.__table__, ({'post_id': i, 'title': _text(rng, 4), 'body': _text(rng, 30), 'user_id': rng.randint(1, users), 'status': 'published',
+                              'created_at': EPOCH + timedelta(seconds=rng.randint(0, 365 * 86400))}
+                             for i in range(1, counts['posts'] + 1)))
+    _insert(Customer.__table__, ({'customer_id': i, 'customer_guid': str(uuid.UUID(int=rng.getrandbits(128))), 'username': f'customer{i}', 'email': f'customer{i}@example.com'}
+                                 for i in range(1, customers + 1)))
+    _insert(Product.__table__, ({'product_id': i, 'product_type_id': 1, 'name': _text(rng, 3), 'short_description': _text(rng, 12)}
+                                for i in range(1, products + 1)))
+    # Each category hangs off one of the 20 previous ones, which builds deep, narrow branches.
+    _insert(Category.__table__, ({'category_id': i, 'meta_title': _text(rng, 2), 'meta_description': _text(rng, 8),
+                                  'parent_category_id': rng.randint(max(1, i - 20), i - 1) if i > 10 else None}
+                                 for i in range(1, categories + 1)))
+    _insert(ProductCategoryMap.__table__, ({'map_id': i, 'product_id': rng.randint(1, products), 'category_id': rng.randint(1, categories),
+                                            'is_featured_product': rng.random() < 0.05, 'display_order': rng.randint(0, 100)}
+                                           for i in range(1, counts['product_category_map'] + 1)))
+    _insert(Warehouse.__table__, ({'warehouse_id': i, 'name': f'warehouse{i}', 'admin_comment': ''} for i in range(1, counts['warehouses'] + 1)))
+    _insert(Order.__table__, ({'order_id': i, 'order_guid': str(uuid.UUID(int=rng.getrandbits(128))), 'store_id': i, 'customer_id': rng.randint(1, customers),
+                               'billing_address_id': i, 'shipping_address_id': i}
+                              for i in range(1, orders + 1)))
+    _insert(OrderItem.__table__, ({'order_item_id': (order_id - 1) * items_per_order + k, 'order_item_guid': str(uuid.UUID(int=rng.getrandbits(128))),
+                                   'order_id': order_id, 'product_id': rng.randint(1, products), 'quantity': rng.randint(1, 5)}
+                                  for order_id in range(1, orders + 1) for k in range(1, items_per_order + 1)))
+    # Four out of five orders are shipped, all of their items from one warehouse.
+    shipped = [order_id for order_id in range(1, orders + 1) if order_id % 5]
+    _insert(Shipment.__table__, ({'shipment_id': index, 'order_id': order_id, 'tracking_number': f'TRK{order_id:010d}', 'total_weight': rng.randint(1, 5000) / 100}
+                                 for index, order_id in enumerate(shipped, 1)))
+    _insert(ShipmentItem.__table__, ({'shipment_id': index, 'order_item_id': (order_id - 1) * items_per_order + k, 'warehouse_id': rng.randint(1, counts['warehouses'])}
+                                     for index, order_id in enumerate(shipped, 1) for k in range(1, items_per_order + 1)))
+    _insert(ProductReview.__table__, ({'review_id': i, 'customer_id': rng.randint(1, customers), 'product_id': rng.randint(1, products),
+                                       'is_approved': rng.random() < 0.8, 'title': _text(rng, 4), 'review_text': _text(rng, 40)}
+                                      for i in range(1, counts['product_reviews'] + 1)))
+    print(f'  product_stats: {product_stats.rebuild()} rows', file=sys.stderr)
+
+
+def _max_ids():
+    return {model: db.session.query(func.max(column)).scalar() or 0
+            for model, column in ((User, User.user_id), (Post, Post.post_id), (Customer, Customer.customer_id), (Product, Product.product_id),
+                                  (Category, Category.category_id), (Order, Order.order_id), (OrderItem, OrderItem.order_item_id),
+                                  (Shipment, Shipment.shipment_id), (Warehouse, Warehouse.warehouse_id), (ShipmentItem, ShipmentItem.shipment_item_id),
+                                  (ProductReview, ProductReview.review_id))}
+
+
+def _sample_guids(limit=1000):
+    return [guid for guid, in db.session.query(Order.order_guid).order_by(Order.order_id).limit(limit)]
+
+
+def read_scenarios(ids, counts, guids):
+    def random_id(model):
+        return lambda rng: rng.randint(1, max(1, ids[model]))
+
+    def page(path, model):
+        pick = random_id(model)
+        return lambda rng: (f'{path}?limit=100&cursor={encode_cursor([pick(rng)])}', None)
+
+    order = random_id(Order)
+    category = random_id(Category)
+    user = random_id(User)
+    customer = random_id(Customer)
+    product = random_id(Product)
+    return [
+        ('GET /users', 'GET', page('/users', User)),
+        ('GET /posts', 'GET', page('/posts', Post)),
+        ('GET /follows', 'GET', lambda rng: (f'/follows?limit=100&cursor={encode_cursor([user(rng), 1])}', None)),
+        ('GET /customers', 'GET', page('/customers', Customer)),
+        ('GET /products', 'GET', page('/products', Product)),
+        ('GET /products/top', 'GET', lambda rng: (f'/products/top?by={rng.choice(("sales", "reviews"))}', None)),
+        ('GET /categories', 'GET', page('/categories', Category)),
+        ('GET /orders', 'GET', page('/orders', Order)),
+        ('GET /order_items', 'GET', page('/order_items', OrderItem)),
+        ('GET /shipments', 'GET', page('/shipments', Shipment)),
+        ('GET /warehouses', 'GET', lambda rng: ('/warehouses', None)),
+        ('GET /shipment_items', 'GET', page('/shipment_items', ShipmentItem)),
+        ('GET /product_reviews', 'GET', page('/product_reviews', ProductReview)),
+        ('GET /orders?customer_id=', 'GET', lambda rng: (f'/orders?customer_id={customer(rng)}&sort=-order_id', None)),
+        ('GET /product_reviews?product_id=', 'GET', lambda rng: (f'/product_reviews?product_id={product(rng)}&is_approved=true', None)),
+        ('GET /orders/<id>/full', 'GET', lambda rng: (f'/orders/{order(rng)}/full', None)),
+        ('GET /orders/by-guid/<guid>', 'GET', lambda rng: (f'/orders/by-guid/{rng.choice(guids)}', None)),
+        ('GET /orders/by-guid?guids=', 'GET', lambda rng: ('/orders/by-guid?guids=' + ','.join(rng.sample(guids, min(100, len(guids)))), None)),
+        ('GET /orders/full', 'GET', lambda rng: ('/orders/full?ids=' + ','.join(str(order(rng)) for _ in range(20)), None)),
+        ('GET /orders/fulfillment', 'GET', lambda rng: ('/orders/fulfillment?ids=' + ','.join(str(order(rng)) for _ in range(100)), None)),
+        ('GET /orders/unfulfilled', 'GET', lambda rng: (f'/orders/unfulfilled?limit=100&cursor={encode_cursor([order(rng)])}', None)),
+        ('GET /categories/tree', 'GET', lambda rng: ('/categories/tree', None)),
+        ('GET /categories/<id>/products', 'GET', lambda rng: (f'/categories/{category(rng)}/products?recursive=1', None)),
+        ('GET /users/<id>/feed', 'GET', lambda rng: (f'/users/{user(rng)}/feed?limit=20', None)),
+        ('GET /changes', 'GET', lambda rng: ('/changes?since=0&limit=100', None)),
+        ('GET /search', 'GET', lambda rng: (f'/search?q={rng.choice(WORDS)}+{rng.choice(WORDS)[:3]}', None)),
+    ]
+
+
+def write_scenarios(ids, counts, created_follows):
+    sequence = itertools.count(1)
+    users = counts['users']
+
+    def existing(model):
+        return lambda rng: rng.randint(1, max(1, ids[model]))
+
+    user, post, customer, product = existing(User), existing(Post), existing(Customer), existing(Product)
+    category, order, order_item = existing(Category), existing(Order), existing(OrderItem)
+    shipment, warehouse, shipment_item, review = existing(Shipment), existing(Warehouse), existing(ShipmentItem), existing(ProductReview)
+
+    def new_follow(rng):
+        # Seeded follows use offsets up to follows_per_user, so these pairs never collide.
+        n = next(sequence)
+        follower = (n - 1) % users + 1
+        followed = (follower + counts['follows_per_user'] + n // users) % users + 1
+        created_follows.append((follower, followed))
+        return '/follows', {'following_user_id': follower, 'followed_user_id': followed}
+
+    def new_order(rng):
+        store_id = ids[Order] + next(sequence)
+        return '/orders', {'order_guid': str(uuid.uuid4()), 'store_id': store_id, 'customer_id': customer(rng), 'billing_address_id': 1, 'shipping_address_id': 1}
+
+    def checkout(rng):
+        _, order_body = new_order(rng)
+        items = [{'method': 'POST', 'path': '/order_items', 'body': {'order_item_guid': str(uuid.uuid4()), 'order_id': '$order.order_id', 'product_id': product(rng), 'quantity': 1}}
+                 for _ in range(3)]
+        return '/batch', [{'method': 'POST', 'path': '/orders', 'body': order_body, 'ref': 'order'}] + items
+
+    return [
+        ('POST /users', 'POST', lambda rng: ('/users', {'username': f'bench{rng.random()}', 'role': 'member'})),
+        ('POST /posts', 'POST', lambda rng: ('/posts', {'title': _text(rng, 4), 'body': _text(rng, 30), 'user_id': user(rng), 'status': 'draft'})),
+        ('POST /follows', 'POST', new_follow),
+        ('POST /customers', 'POST', lambda rng: ('/customers', {'customer_guid': str(uuid.uuid4()), 'username': 'bench', 'email': 'bench@example.com'})),
+        ('POST /products', 'POST', lambda rng: ('/products', {'product_type_id': 1, 'name': _text(rng, 3), 'short_description': _text(rng, 12)})),
+        ('POST /categories', 'POST', lambda rng: ('/categories', {'meta_title': _text(rng, 2), 'meta_description': '', 'parent_category_id': category(rng)})),
+        ('POST /orders', 'POST', new_order),
+        ('POST /order_items', 'POST', lambda rng: ('/order_items', {'order_item_guid': str(uuid.uuid4()), 'order_id': order(rng), 'product_id': product(rng), 'quantity': 1})),
+        ('POST /order_items/bulk', 'POST', lambda rng: ('/order_items/bulk', [{'order_item_guid': str(uuid.uuid4()), 'order_id': order(rng), 'product_id': product(rng), 'quantity': 1} for _ in range(100)])),
+        ('POST /batch (checkout)', 'POST', checkout),
+        ('POST /shipments', 'POST', lambda rng: ('/shipments', {'order_id': order(rng), 'tracking_number': 'BENCH', 'total_weight': 1.5, 'shipped_date_utc': None})),
+        ('POST /warehouses', 'POST', lambda rng: ('/warehouses', {'name': 'bench', 'admin_comment': ''})),
+        ('POST /shipment_items', 'POST', lambda rng: ('/shipment_items', {'shipment_id': shipment(rng), 'order_item_id': order_item(rng), 'warehouse_id': warehouse(rng)})),
+        ('POST /product_reviews', 'POST', lambda rng: ('/product_reviews', {'customer_id': customer(rng), 'product_id': product(rng), 'is_approved': True, 'title': _text(rng, 4), 'review_text': _text(rng, 40)})),
+        ('PUT /users/<id>', 'PUT', lambda rng: (f'/users/{user(rng)}', {'username': f'user{rng.random()}'})),
+        ('PUT /posts/<id>', 'PUT', lambda rng: (f'/posts/{post(rng)}', {'title': _text(rng, 4), 'body': _text(rng, 30), 'status': 'published'})),
+        ('PUT /customers/<id>', 'PUT', lambda rng: (f'/customers/{customer(rng)}', {'username': 'customer', 'email': 'customer@example.com'})),
+        ('PUT /products/<id>', 'PUT', lambda rng: (f'/products/{product(rng)}', {'name': _text(rng, 3)})),
+        ('PUT /categories/<id>', 'PUT', lambda rng: (f'/categories/{category(rng)}', {'meta_title': _text(rng, 2), 'meta_description': ''})),
+        ('PUT /orders/<id>', 'PUT', lambda rng: (f'/orders/{order(rng)}', {'billing_address_id': 2, 'shipping_address_id': 2})),
+        ('PUT /order_items/<id>', 'PUT', lambda rng: (f'/order_items/{order_item(rng)}', {'quantity': rng.randint(1, 5)})),
+        ('PUT /shipments/<id>', 'PUT', lambda rng: (f'/shipments/{shipment(rng)}', {'tracking_number': 'BENCH', 'total_weight': 2.5, 'shipped_date_utc': None})),
+        ('PUT /warehouses/<id>', 'PUT', lambda rng: (f'/warehouses/{warehouse(rng)}', {'name': 'warehouse', 'admin_comment': ''})),
+        ('PUT /shipment_items/<id>', 'PUT', lambda rng: (f'/shipment_items/{shipment_item(rng)}', {'order_item_id': order_item(rng), 'warehouse_id': warehouse(rng)})),
+        ('PUT /product_reviews/<id>', 'PUT', lambda rng: (f'/product_reviews/{review(rng)}', {'is_approved': True, 'title': _text(rng, 4), 'review_text': _text(rng, 40)})),
+        ('PATCH /orders/<id>', 'PATCH', lambda rng: (f'/orders/{order(rng)}', {'shipping_address_id': 3})),
+        ('PATCH /shipments/<id>', 'PATCH', lambda rng: (f'/shipments/{shipment(rng)}', {'tracking_number': 'PATCHED'})),
+        ('PATCH /product_reviews/<id>', 'PATCH', lambda rng: (f'/product_reviews/{review(rng)}', {'title': _text(rng, 4)})),
+    ]
+
+
+def delete_scenarios(before, after, follows):
+    # Only rows created by the write phase are deleted, newest dependants first.
+    plan = [('shipment_items', ShipmentItem), ('product_reviews', ProductReview), ('shipments', Shipment), ('order_items', OrderItem),
+            ('orders', Order), ('posts', Post), ('categories', Category), ('products', Product), ('warehouses', Warehouse),
+            ('customers', Customer), ('users', User)]
+    scenarios = []
+    for path, model in plan:
+        created = iter(range(before[model] + 1, after[model] + 1))
+        scenarios.append((f'DELETE /{path}/<id>', 'DELETE', lambda rng, path=path, created=created: (f'/{path}/{next(created, 0)}', None)))
+    pairs = iter(follows)
+    scenarios.append(('DELETE /follows/<a>/<b>', 'DELETE', lambda rng: ('/follows/{}/{}'.format(*next(pairs, (0, 0))), None)))
+    return scenarios
+
+
+class Client:
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.local = threading.local()
+
+    def request(self, method, path, body):
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        payload = json.dumps(body) if body is not None else None
+        for attempt in range(2):
+            connection = getattr(self.local, 'connection', None)
+            if connection is None:
+                connection = self.local.connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            try:
+                connection.request(method, path, payload, headers)
+                response = connection.getresponse()
+                response.read()
+                return response.status, response.getheader('Server-Timing', '')
+            except (http.client.HTTPException, OSError):
+                connection.close()
+                self.local.connection = None
+                if attempt:
+                    raise
+
+
+def _query_count(server_timing):
+    for metric in server_timing.split(','):
+        if metric.strip().startswith('db;') and 'desc="' in metric:
+            return int(metric.split('desc="')[1].split()[0])
+    return None
+
+
+def _percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered))) - 1))]
+
+
+def drive(client, scenario, requests, concurrency, seed_value):
+    name, method, make = scenario
+    latencies, queries = [], []
+    errors = 0
+    lock = threading.Lock()
+
+    def worker(index):
+        nonlocal errors
+        rng = random.Random(seed_value * 1000003 + index)
+        for _ in range(index, requests, concurrency):
+            path, body = make(rng)
+            start = time.perf_counter()
+            try:
+                status, server_timing = client.request(method, path, body)
+            except (http.client.HTTPException, OSError):
+                status, server_timing = 599, ''
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                count = _query_count(server_timing)
+                if count is not None:
+                    queries.append(count)
+                if status >= 500:
+                    errors += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    wall = time.perf_counter() - start
+    result = {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / wall, 1),
+        'p50_ms': round(_percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(_percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(_percentile(latencies, 0.99) * 1000, 2),
+        'queries': round(sum(queries) / len(queries), 1) if queries else None,
+    }
+    print(f'{name:34} {result["requests"]:6} {errors:5} {result["rps"]:9} {result["p50_ms"]:9} {result["p95_ms"]:9} {result["p99_ms"]:9} {result["queries"]!s:>8}', file=sys.stderr)
+    return name, result
+
+
+def serve(app, port):
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def setup(self):
+            super().setup()
+            # Headers and body go out in separate writes; without this Nagle adds ~40 ms per response.
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def log_request(self, *args, **kwargs):
+            pass
+
+    make_server('127.0.0.1', port, app, threaded=True, request_handler=QuietHandler).serve_forever()
+
+
+def _spawn(server, port):
+    if not port:
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            port = probe.getsockname()[1]
+    # Both servers run in a child of their own, so latency and peak RSS are measured the same way for each.
+    if server == 'asgi':
+        command = [sys.executable, '-m', 'uvicorn', 'asgi:app', '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning']
+    else:
+        command = [sys.executable, os.path.abspath(__file__), 'serve', '--port', str(port)]
+    # Every scenario comes from this one client; per-client buckets would throttle the benchmark itself.
+    env = dict(os.environ, RATE_LIMIT_PER_SECOND='0')
+    process = subprocess.Popen(command, cwd=os.path.dirname(os.path.abspath(__file__)), env=env)
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            break
+        except OSError:
+            if process.poll() is not None or time.monotonic() > deadline:
+                process.kill()
+                raise SystemExit(f'{server.upper()} server did not start')
+            time.sleep(0.1)
+    return process, f'http://127.0.0.1:{port}'
+
+
+def _selected(scenarios, server):
+    if server != 'asgi':
+        return scenarios
+    return [scenario for scenario in scenarios if ASGI_SCENARIO.match(scenario[0])]
+
+
+def run(app, args):
+    process = None
+    if args.url:
+        url = args.url
+    else:
+        process, url = _spawn(args.server, args.port)
+    client = Client(url)
+    counts = _volumes(args.scale)
+    print(f'{"scenario":34} {"n":>6} {"err":>5} {"req/s":>9} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"queries":>8}', file=sys.stderr)
+
+    results = {}
+    try:
+        with app.app_context():
+            ids = _max_ids()
+            guids = _sample_guids()
+        for scenario in _selected(read_scenarios(ids, counts, guids), args.server):
+            name, result = drive(client, scenario, args.requests, args.concurrency, args.seed)
+            results[name] = result
+        if args.writes:
+            created_follows = []
+            for scenario in _selected(write_scenarios(ids, counts, created_follows), args.server):
+                name, result = drive(client, scenario, args.requests, args.concurrency, args.seed)
+                results[name] = result
+            with app.app_context():
+                after = _max_ids()
+            for scenario in _selected(delete_scenarios(ids, after, created_follows), args.server):
+                name, result = drive(client, scenario, args.requests, args.concurrency, args.seed)
+                results[name] = result
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    if args.url:
+        peak_rss = None
+    else:
+        # The server is the only child this process waits for, so this is its peak alone.
+        peak_rss = round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1)
+    report = {
+        'meta': {'url': url, 'server': args.server, 'scale': args.scale, 'requests': args.requests, 'concurrency': args.concurrency, 'started': time.strftime('%Y-%m-%dT%H:%M:%S')},
+        'peak_rss_mb': peak_rss,
+        'results': results,
+    }
+    if report['peak_rss_mb'] is not None:
+        print(f'peak RSS: {report["peak_rss_mb"]} MB', file=sys.stderr)
+    if args.save:
+        with open(args.save, 'w') as handle:
+            json.dump(report, handle, indent=2)
+    if args.baseline:
+        with open(args.baseline) as handle:
+            return compare(json.load(handle), report, args.threshold)
+    return 0
+
+
+def compare(baseline, current, threshold):
+    regressions = 0
+    print(f'{"scenario":34} {"p95 base":>9} {"p95 now":>9} {"delta":>8} {"rps base":>9} {"rps now":>9} {"delta":>8}')
+    for name, now in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        p95_delta = (now['p95_ms'] - base['p95_ms']) / base['p95_ms'] * 100 if base['p95_ms'] else 0.0
+        rps_delta = (now['rps'] - base['rps']) / base['rps'] * 100 if base['rps'] else 0.0
+        flag = ''
+        if p95_delta > threshold or rps_delta < -threshold or now['errors'] > base['errors']:
+            flag = '  REGRESSION'
+            regressions += 1
+        print(f'{name:34} {base["p95_ms"]:9} {now["p95_ms"]:9} {p95_delta:+7.1f}% {base["rps"]:9} {now["rps"]:9} {rps_delta:+7.1f}%{flag}')
+    print(f'{regressions} regression(s) beyond {threshold}%')
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Seed a local database and benchmark every route.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    seed_parser = commands.add_parser('seed', help='create the schema and load synthetic data')
+    seed_parser.add_argument('--scale', type=float, default=1.0)
+    seed_parser.add_argument('--seed', type=int, default=42)
+
+    run_parser = commands.add_parser('run', help='drive every route with concurrent clients')
+    run_parser.add_argument('--scale', type=float, default=1.0, help='scale used when seeding')
+    run_parser.add_argument('--server', choices=('wsgi', 'asgi'), default='wsgi',
+                            help='spawn the Flask app under werkzeug or the ASGI app under uvicorn')
+    run_parser.add_argument('--url', help='benchmark an already running server instead of spawning one')
+    run_parser.add_argument('--port', type=int, default=0)
+    run_parser.add_argument('--requests', type=int, default=200, help='requests per scenario')
+    run_parser.add_argument('--concurrency', type=int, default=8)
+    run_parser.add_argument('--seed', type=int, default=42)
+    run_parser.add_argument('--no-writes', dest='writes', action='store_false', help='only run read scenarios')
+    run_parser.add_argument('--save', help='write the results to this JSON file')
+    run_parser.add_argument('--baseline', help='compare against a previously saved result file')
+    run_parser.add_argument('--threshold', type=float, default=10.0, help='allowed regression in percent')
+
+    serve_parser = commands.add_parser('serve', help='serve the Flask app the way run --server wsgi does')
+    serve_parser.add_argument('--port', type=int, default=5000)
+
+    compare_parser = commands.add_parser('compare', help='compare two saved result files')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=10.0)
+
+    args = parser.parse_args(argv)
+    if args.command == 'compare':
+        with open(args.baseline) as baseline, open(args.current) as current:
+            return compare(json.load(baseline), json.load(current), args.threshold)
+
+    from app import app
+
+    if args.command == 'seed':
+        with app.app_context():
+            seed(_volumes(args.scale), args.seed)
+        return 0
+    if args.command == 'serve':
+        serve(app, args.port)
+        return 0
+    return run(app, args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
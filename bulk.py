@@ -0,0 +1,111 @@
+import uuid
+
+from flask import current_app, jsonify, request
+from sqlalchemy import func, select
+
+import change_log
+import product_stats
+from models import db, GUID
+
+
+def _missing_references(table, rows):
+    missing = {}
+    for fk in table.foreign_keys:
+        column = fk.parent.name
+        values = {row[column] for row in rows}
+        found = set(db.session.execute(select(fk.column).where(fk.column.in_(values))).scalars())
+        missing[column] = values - found
+    return missing
+
+
+def _invalid_references(table, row):
+    # Lists and objects can't be looked up (or hashed), so they fail their own row instead of the whole request.
+    return [fk.parent.name for fk in table.foreign_keys if isinstance(row.get(fk.parent.name), (list, dict))]
+
+
+def _unique_columns(table):
+    columns = [list(index.columns)[0] for index in table.indexes if index.unique and len(index.columns) == 1]
+    return [column for column in columns if not column.primary_key]
+
+
+def _guid_errors(table, row):
+    # GUIDs are normalised up front so a malformed one fails its own row instead of the whole insert.
+    invalid = []
+    for column in table.columns:
+        if isinstance(column.type, GUID) and row.get(column.name) is not None:
+            try:
+                row[column.name] = str(uuid.UUID(str(row[column.name])))
+            except ValueError:
+                invalid.append(column.name)
+    return invalid
+
+
+def _duplicate_values(table, rows):
+    duplicates = {}
+    for column in _unique_columns(table):
+        values = [row[column.name] for row in rows if row.get(column.name) is not None]
+        seen, repeated = set(), set()
+        for value in values:
+            (repeated if value in seen else seen).add(value)
+        repeated.update(db.session.execute(select(column).where(column.in_(seen))).scalars())
+        duplicates[column.name] = repeated
+    return duplicates
+
+
+def bulk_insert(model, required, optional=()):
+    data = request.get_json()
+    if not isinstance(data, list):
+        return jsonify({'message': 'Se esperaba una lista de elementos'}), 400
+    if len(data) > current_app.config['BULK_MAX_ROWS']:
+        return jsonify({'message': 'Demasiados elementos en una sola petición'}), 413
+
+    table = model.__table__
+    candidates, errors = [], []
+    for index, item in enumerate(data):
+        if not isinstance(item, dict):
+            errors.append({'index': index, 'error': 'Elemento inválido'})
+            continue
+        missing = [field for field in required if item.get(field) is None]
+        if missing:
+            errors.append({'index': index, 'error': 'Faltan campos: ' + ', '.join(missing)})
+            continue
+        row = {field: item.get(field) for field in (*required, *optional)}
+        invalid = _guid_errors(table, row)
+        if invalid:
+            errors.append({'index': index, 'error': 'GUID inválido: ' + ', '.join(invalid)})
+            continue
+        invalid = _invalid_references(table, row)
+        if invalid:
+            errors.append({'index': index, 'error': 'Referencias inválidas: ' + ', '.join(invalid)})
+            continue
+        if not product_stats.countable(model, row):
+            errors.append({'index': index, 'error': 'Cantidad inválida'})
+            continue
+        candidates.append((index, row))
+
+    rows = []
+    if candidates:
+        missing = _missing_references(table, [row for _, row in candidates])
+        duplicates = _duplicate_values(table, [row for _, row in candidates])
+        for index, row in candidates:
+            broken = [column for column, values in missing.items() if row[column] in values]
+            repeated = [column for column, values in duplicates.items() if row.get(column) in values]
+            if broken:
+                errors.append({'index': index, 'error': 'Referencias inexistentes: ' + ', '.join(broken)})
+            elif repeated:
+                errors.append({'index': index, 'error': 'Valores duplicados: ' + ', '.join(repeated)})
+            else:
+                rows.append(row)
+
+    if rows:
+        pk = list(table.primary_key.columns)[0]
+        before = db.session.execute(select(func.max(pk))).scalar() or 0
+        db.session.execute(table.insert(), rows)
+        # Newer keys committed by concurrent writers may be logged twice, which consumers treat as a no-op.
+        inserted = db.session.execute(select(pk).where(pk > before)).scalars().all()
+        change_log.record(model, change_log.INSERT, [(key,) for key in inserted])
+        product_stats.record_inserts(model, rows)
+        db.session.commit()
+
+    errors.sort(key=lambda error: error['index'])
+    return jsonify({'message': f'{len(rows)} elementos creados', 'created': len(rows), 'errors': errors}), 201 if rows else 400
@@ -0,0 +1,63 @@
+from sqlalchemy import inspect, select
+
+import change_log
+import product_stats
+from archive import MODELS as ARCHIVES
+from models import (Customer, Order, OrderItem, Shipment, ShipmentItem, ProductReview,
+                    ArchivedOrder, ArchivedOrderItem, ArchivedShipment, ArchivedShipmentItem)
+from serializers import SERIALIZERS
+
+CHILDREN = {
+    Customer: ((Order, 'customer_id'), (ArchivedOrder, 'customer_id'), (ProductReview, 'customer_id')),
+    Order: ((OrderItem, 'order_id'), (Shipment, 'order_id')),
+    OrderItem: ((ShipmentItem, 'order_item_id'),),
+    Shipment: ((ShipmentItem, 'shipment_id'),),
+    ArchivedOrder: ((ArchivedOrderItem, 'order_id'), (ArchivedShipment, 'order_id')),
+    ArchivedOrderItem: ((ArchivedShipmentItem, 'order_item_id'),),
+    ArchivedShipment: ((ArchivedShipmentItem, 'shipment_id'),),
+}
+# Every table is deleted from once, after everything that references it.
+DELETE_ORDER = (ShipmentItem, ArchivedShipmentItem, Shipment, ArchivedShipment, OrderItem, ArchivedOrderItem,
+                ProductReview, Order, ArchivedOrder, Customer)
+# Archived rows are the same resources to change feed consumers.
+LOGGED_AS = {archived: model for model, archived in ARCHIVES.items()}
+
+
+def _pk(model):
+    return inspect(model).primary_key[0]
+
+
+def _load(session, model, column, keys):
+    names = product_stats.CONTRIBUTIONS[model][0] if model in product_stats.CONTRIBUTIONS else ()
+    rows = session.execute(select(_pk(model), *(getattr(model, name) for name in names)).where(column.in_(keys))).all()
+    return {row[0]: dict(zip(names, row[1:])) for row in rows}
+
+
+def collect(session, model, ids):
+    found = {}
+    pending = [(model, _pk(model), list(ids))]
+    while pending:
+        model, column, keys = pending.pop()
+        seen = found.setdefault(model, {})
+        rows = {key: row for key, row in _load(session, model, column, keys).items() if key not in seen}
+        if not rows:
+            continue
+        seen.update(rows)
+        for child, name in CHILDREN.get(model, ()):
+            pending.append((child, getattr(child, name), list(rows)))
+    return {model: rows for model, rows in found.items() if rows}
+
+
+def delete(session, model, ids):
+    # A SELECT per parent-child link and one DELETE per table, however many rows hang off the ones being deleted.
+    found = collect(session, model, ids)
+    for target in DELETE_ORDER:
+        rows = found.get(target)
+        if not rows:
+            continue
+        session.execute(target.__table__.delete().where(_pk(target).in_(list(rows))))
+        logged = LOGGED_AS.get(target, target)
+        if logged in SERIALIZERS:
+            change_log.record(logged, change_log.DELETE, [(key,) for key in rows], session)
+        product_stats.record_deletes(target, rows.values(), session)
+    return found
@@ -0,0 +1,108 @@
+import json
+import threading
+import time
+
+from flask import current_app
+
+from models import db, Category
+
+
+class CategoryTree:
+    def __init__(self, rows):
+        self.titles = {}
+        children = {}
+        for category_id, parent_id, title in rows:
+            self.titles[category_id] = title
+            children.setdefault(parent_id, []).append(category_id)
+        for ids in children.values():
+            ids.sort()
+
+        self.children = children
+        self.roots = sorted(category_id for category_id, parent_id, _ in rows if parent_id not in self.titles)
+        self.order = []
+        self.enter = {}
+        self.exit = {}
+        for root in self.roots:
+            self._walk(root)
+        # Categories caught in a parent cycle are unreachable from any root.
+        for category_id in sorted(self.titles):
+            if category_id not in self.enter:
+                self.roots.append(category_id)
+                self._walk(category_id)
+
+    def _walk(self, root):
+        stack = [(root, False)]
+        while stack:
+            category_id, done = stack.pop()
+            if done:
+                self.exit[category_id] = len(self.order)
+                continue
+            if category_id in self.enter:
+                continue
+            self.enter[category_id] = len(self.order)
+            self.order.append(category_id)
+            stack.append((category_id, True))
+            for child in reversed(self.children.get(category_id, ())):
+                if child not in self.enter:
+                    stack.append((child, False))
+
+    def __contains__(self, category_id):
+        return category_id in self.enter
+
+    def descendants(self, category_id):
+        return self.order[self.enter[category_id]:self.exit[category_id]]
+
+    def as_tree(self):
+        # Built from the walk order with an explicit stack: chains of categories run deeper than Python's recursion limit.
+        roots, open_nodes = [], []
+        for position, category_id in enumerate(self.order):
+            while open_nodes and self.exit[open_nodes[-1]['category_id']] <= position:
+                open_nodes.pop()
+            node = {'category_id': category_id, 'meta_title': self.titles[category_id], 'children': []}
+            (open_nodes[-1]['children'] if open_nodes else roots).append(node)
+            open_nodes.append(node)
+        return roots
+
+
+def dumps(value):
+    # The json encoders recurse per nesting level too, so deep trees are written out with a stack of pending tokens.
+    out, stack = [], [(False, value)]
+    while stack:
+        raw, item = stack.pop()
+        if raw:
+            out.append(item)
+        elif isinstance(item, dict):
+            tokens = [(True, '{')]
+            for index, (key, child) in enumerate(sorted(item.items())):
+                tokens += [(True, (',' if index else '') + json.dumps(key, ensure_ascii=False) + ':'), (False, child)]
+            stack.extend(reversed(tokens + [(True, '}')]))
+        elif isinstance(item, list):
+            tokens = [(True, '[')]
+            for index, child in enumerate(item):
+                if index:
+                    tokens.append((True, ','))
+                tokens.append((False, child))
+            stack.extend(reversed(tokens + [(True, ']')]))
+        else:
+            out.append(json.dumps(item, ensure_ascii=False))
+    return ''.join(out).encode('utf-8')
+
+_lock = threading.Lock()
+_tree = None
+_built_at = 0.0
+
+
+def get_tree():
+    global _tree, _built_at
+    with _lock:
+        if _tree is None or time.monotonic() - _built_at > current_app.config['CATEGORY_TREE_TTL']:
+            rows = db.session.query(Category.category_id, Category.parent_category_id, Category.meta_title).all()
+            _tree = CategoryTree(rows)
+            _built_at = time.monotonic()
+        return _tree
+
+
+def invalidate():
+    global _tree
+    with _lock:
+        _tree = None
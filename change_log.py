@@ -0,0 +1,176 @@
+import json
+import math
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import and_, bindparam, event, func, inspect, select, tuple_
+from sqlalchemy.orm import Session
+
+import archive
+from models import db, ChangeLog, ChangeLogWatermark
+from serializers import SERIALIZERS
+
+TABLES = {serializer.model.__tablename__: serializer for serializer in SERIALIZERS.values()}
+INSERT, UPDATE, DELETE, ARCHIVE = 'I', 'U', 'D', 'A'
+
+
+class ChangesExpired(Exception):
+    pass
+
+
+def _entry(model, operation, key):
+    return {'table_name': model.__tablename__, 'operation': operation,
+            'row_key': json.dumps(list(key), separators=(',', ':')), 'created_at': datetime.utcnow()}
+
+
+def record(model, operation, keys, session=None):
+    entries = [_entry(model, operation, key) for key in keys]
+    if entries:
+        (db.session if session is None else session).execute(ChangeLog.__table__.insert(), entries)
+
+
+@event.listens_for(Session, 'after_flush')
+def _after_flush(session, flush_context):
+    entries = []
+    for instances, operation in ((session.new, INSERT), (session.dirty, UPDATE), (session.deleted, DELETE)):
+        for instance in instances:
+            model = type(instance)
+            if model not in SERIALIZERS:
+                continue
+            if operation == UPDATE and not session.is_modified(instance):
+                continue
+            entries.append(_entry(model, operation, inspect(model).primary_key_from_instance(instance)))
+    if entries:
+        session.execute(ChangeLog.__table__.insert(), entries)
+
+
+def pruned_through():
+    watermark = db.session.query(ChangeLogWatermark.seq).filter(ChangeLogWatermark.name == 'pruned').scalar()
+    return watermark or 0
+
+
+def _load_rows(serializer, keys):
+    names = tuple(serializer.attributes)
+    pk = [serializer.attributes[name] for name in serializer.primary_key]
+    query = db.session.query(*serializer.columns(names))
+    if len(pk) == 1:
+        query = query.filter(pk[0].in_([key[0] for key in keys]))
+    else:
+        query = query.filter(tuple_(*pk).in_(keys))
+    return {tuple(getattr(row, name) for name in serializer.primary_key): dict(zip(names, row)) for row in query}
+
+
+def _archived_keys(model, keys):
+    archived = archive.MODELS.get(model)
+    if archived is None:
+        return set()
+    pk = inspect(archived).primary_key[0]
+    return {(key,) for key in db.session.execute(select(pk).where(pk.in_([key[0] for key in keys]))).scalars()}
+
+
+def load_changes(since, tables, limit):
+    if since < pruned_through():
+        raise ChangesExpired(since)
+
+    query = db.session.query(ChangeLog).filter(ChangeLog.seq > since)
+    if tables:
+        query = query.filter(ChangeLog.table_name.in_(tables))
+    entries = query.order_by(ChangeLog.seq).limit(limit + 1).all()
+    has_more = len(entries) > limit
+
+    # Entries still inside the settle window may sit behind a lower seq whose transaction has not committed yet.
+    settled = datetime.utcnow() - timedelta(seconds=current_app.config['CHANGE_LOG_SETTLE_SECONDS'])
+    latest = {}
+    next_since = since
+    retry_after = None
+    for entry in entries[:limit]:
+        if entry.created_at > settled:
+            # Asking again before it settles would return this same page, so the caller is told to wait instead.
+            has_more = False
+            retry_after = math.ceil((entry.created_at - settled).total_seconds())
+            break
+        latest[(entry.table_name, entry.row_key)] = entry.operation
+        next_since = entry.seq
+
+    keys = {}
+    for (table_name, row_key), operation in latest.items():
+        keys.setdefault(table_name, []).append((tuple(json.loads(row_key)), operation))
+
+    changes = {}
+    for table_name, logged in sorted(keys.items()):
+        serializer = TABLES[table_name]
+        upserts = [key for key, operation in logged if operation not in (DELETE, ARCHIVE)]
+        rows = _load_rows(serializer, upserts) if upserts else {}
+        # A row gone by now is reported as deleted whatever its last logged operation was, unless the archive has it.
+        gone = [key for key, operation in logged if operation != ARCHIVE and key not in rows]
+        moved = _archived_keys(serializer.model, gone) if gone else set()
+        changes[table_name] = {
+            'upserted': [rows[key] for key in upserts if key in rows],
+            'archived': [dict(zip(serializer.primary_key, key)) for key, operation in logged if operation == ARCHIVE or key in moved],
+            'deleted': [dict(zip(serializer.primary_key, key)) for key in gone if key not in moved],
+        }
+    return {'since': since, 'next_since': next_since, 'has_more': has_more, 'retry_after': retry_after, 'changes': changes}
+
+
+def prune():
+    cutoff = datetime.utcnow() - timedelta(days=current_app.config['CHANGE_LOG_RETENTION_DAYS'])
+    newest = db.session.query(func.max(ChangeLog.seq)).filter(ChangeLog.created_at < cutoff).scalar()
+    # The newest expired entry stays behind so an emptied table can never hand out its seq again.
+    through = newest - 1 if newest is not None else None
+    start = pruned_through()
+    if through is None or through <= start:
+        return 0
+
+    # Raise the watermark first so readers behind it get 410 rather than a silent gap.
+    watermark = ChangeLogWatermark.query.get('pruned') or ChangeLogWatermark(name='pruned')
+    watermark.seq = through
+    db.session.add(watermark)
+    db.session.commit()
+
+    table = ChangeLog.__table__
+    chunk = current_app.config['CHANGE_LOG_CHUNK_SIZE']
+    deleted = 0
+    low = start
+    while low < through:
+        high = min(low + chunk, through)
+        deleted += db.session.execute(table.delete().where(and_(table.c.seq > low, table.c.seq <= high))).rowcount
+        db.session.commit()
+        low = high
+    return deleted
+
+
+def compact():
+    # Consumers read current rows, so any entry followed by a newer one for the same row carries nothing.
+    superseded = (db.session.query(ChangeLog.table_name, ChangeLog.row_key, func.max(ChangeLog.seq))
+                  .group_by(ChangeLog.table_name, ChangeLog.row_key)
+                  .having(func.count() > 1)
+                  .all())
+    table = ChangeLog.__table__
+    statement = table.delete().where(and_(table.c.table_name == bindparam('t'), table.c.row_key == bindparam('k'),
+                                          table.c.seq < bindparam('s')))
+    chunk = current_app.config['CHANGE_LOG_CHUNK_SIZE']
+    deleted = 0
+    for offset in range(0, len(superseded), chunk):
+        batch = [{'t': table_name, 'k': row_key, 's': seq} for table_name, row_key, seq in superseded[offset:offset + chunk]]
+        deleted += db.session.execute(statement, batch).rowcount
+        db.session.commit()
+    return deleted
+
+
+cli = AppGroup('change-log', help='Maintain the change log behind GET /changes.')
+
+
+@cli.command('prune', help='Delete entries older than CHANGE_LOG_RETENTION_DAYS.')
+def prune_command():
+    click.echo(f'{prune()} entradas eliminadas')
+
+
+@cli.command('compact', help='Delete entries superseded by a newer entry for the same row.')
+def compact_command():
+    click.echo(f'{compact()} entradas compactadas')
+
+
+def init_app(app):
+    app.cli.add_command(cli)
@@ -0,0 +1,57 @@
+import heapq
+from datetime import datetime
+from itertools import islice
+
+from flask import current_app
+from sqlalchemy import and_, or_, select, union_all
+
+from models import db, Follow, Post
+from pagination import InvalidCursor, decode_cursor, encode_cursor
+
+NEWEST_FIRST = (Post.created_at.desc(), Post.post_id.desc())
+
+
+def _sort_key(row):
+    return row.created_at, row.post_id
+
+
+def _parse_cursor(cursor):
+    created_at, post_id = decode_cursor(cursor, 2)
+    try:
+        return datetime.fromisoformat(created_at), int(post_id)
+    except (TypeError, ValueError):
+        raise InvalidCursor(cursor)
+
+
+def _newest(authors, criteria, limit):
+    # One bounded range scan of ix_posts_user_id_created_at per author, sent as a single UNION ALL.
+    parts = [select(Post.__table__).where(Post.user_id == author, *criteria).order_by(*NEWEST_FIRST).limit(limit).subquery()
+             for author in authors]
+    rows = db.session.execute(union_all(*(select(part) for part in parts))).all()
+    per_author = {}
+    for row in rows:
+        per_author.setdefault(row.user_id, []).append(row)
+    return [sorted(posts, key=_sort_key, reverse=True) for posts in per_author.values()]
+
+
+def load_feed(user_id, limit, cursor=None):
+    criteria = [Post.created_at.isnot(None)]
+    if cursor:
+        created_at, post_id = _parse_cursor(cursor)
+        criteria.append(or_(Post.created_at < created_at, and_(Post.created_at == created_at, Post.post_id < post_id)))
+
+    authors = db.session.execute(select(Follow.followed_user_id)
+                                 .where(Follow.following_user_id == user_id)
+                                 .order_by(Follow.followed_user_id)).scalars().all()
+    chunk = current_app.config['FEED_AUTHORS_PER_QUERY']
+    per_author = []
+    for offset in range(0, len(authors), chunk):
+        per_author += _newest(authors[offset:offset + chunk], criteria, limit + 1)
+
+    # Each author contributes at most one page of its newest posts; the merge keeps the newest limit + 1 overall.
+    page = list(islice(heapq.merge(*per_author, key=_sort_key, reverse=True), limit + 1))
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        next_cursor = encode_cursor([page[-1].created_at.isoformat(), page[-1].post_id])
+    return page, next_cursor
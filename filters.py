@@ -0,0 +1,112 @@
+import logging
+import operator
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import Boolean, UniqueConstraint
+
+from serializers import SERIALIZERS
+
+logger = logging.getLogger(__name__)
+
+RESERVED = ('fields', 'limit', 'cursor', 'stream', 'sort')
+MAX_IN_VALUES = 1000
+BOOLEANS = {'true': True, '1': True, 'false': False, '0': False}
+OPERATORS = {
+    'eq': operator.eq,
+    'ne': operator.ne,
+    'gt': operator.gt,
+    'gte': operator.ge,
+    'lt': operator.lt,
+    'lte': operator.le,
+    'in': lambda column, values: column.in_(values),
+    'isnull': lambda column, value: column.is_(None) if value else column.isnot(None),
+}
+
+
+class InvalidFilter(ValueError):
+    pass
+
+
+def coerce(column, raw):
+    python_type = column.type.python_type
+    if python_type is bool:
+        if isinstance(raw, bool):
+            return raw
+        value = BOOLEANS.get(str(raw).lower())
+        if value is None:
+            raise ValueError(raw)
+        return value
+    if python_type in (datetime, date):
+        return python_type.fromisoformat(raw)
+    if python_type is Decimal:
+        return Decimal(str(raw))
+    return python_type(raw)
+
+
+def _value(column, op, raw):
+    if op == 'isnull':
+        return BOOLEANS[raw.lower()]
+    if op == 'in':
+        values = [coerce(column, part) for part in raw.split(',') if part != '']
+        if not values or len(values) > MAX_IN_VALUES:
+            raise ValueError(raw)
+        return values
+    return coerce(column, raw)
+
+
+def parse_filters(serializer, args):
+    criteria = []
+    for key, raw in args.items():
+        if key in RESERVED:
+            continue
+        name, _, op = key.partition('__')
+        op = op or 'eq'
+        if name not in serializer.filters or op not in OPERATORS:
+            raise InvalidFilter(key)
+        column = serializer.attributes[name]
+        try:
+            value = _value(column, op, raw)
+        except (ArithmeticError, KeyError, TypeError, ValueError):
+            raise InvalidFilter(key)
+        criteria.append(OPERATORS[op](column, value))
+    return criteria
+
+
+def parse_sort(serializer, raw):
+    sort = {}
+    for part in (raw or '').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        name = part.lstrip('-')
+        if name not in serializer.filters:
+            raise InvalidFilter('sort')
+        sort.setdefault(name, part.startswith('-'))
+    return tuple(sort.items())
+
+
+def _indexed_columns(table):
+    leading = {column.name for column in list(table.primary_key.columns)[:1]}
+    leading.update(list(index.columns)[0].name for index in table.indexes)
+    leading.update(list(constraint.columns)[0].name for constraint in table.constraints
+                   if isinstance(constraint, UniqueConstraint) and constraint.columns)
+    return leading
+
+
+def unindexed_filters():
+    missing = []
+    for serializer in SERIALIZERS.values():
+        table = serializer.model.__table__
+        indexed = _indexed_columns(table)
+        for name in serializer.filters:
+            column = serializer.attributes[name].property.columns[0]
+            # A boolean on its own never narrows a scan enough to be worth an index.
+            if column.name not in indexed and not isinstance(column.type, Boolean):
+                missing.append(f'{table.name}.{column.name}')
+    return missing
+
+
+def warn_unindexed():
+    for column in unindexed_filters():
+        logger.warning('Filterable column %s has no index leading with it', column)
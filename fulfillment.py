@@ -0,0 +1,101 @@
+from flask import current_app
+from sqlalchemy import func
+
+from filters import coerce
+from models import db, Order, OrderItem, ShipmentItem, ArchivedOrder, ArchivedOrderItem, ArchivedShipmentItem
+from pagination import InvalidCursor, decode_cursor, encode_cursor
+
+HOT = (Order, OrderItem, ShipmentItem)
+ARCHIVED = (ArchivedOrder, ArchivedOrderItem, ArchivedShipmentItem)
+
+
+def _status(remaining, shipped):
+    if not remaining:
+        return 'shipped'
+    return 'partial' if shipped else 'pending'
+
+
+def _aggregate(order_ids, graph=HOT):
+    order, item, shipment_item = graph
+    # One grouped pass per batch: each shipment item row is one shipped unit of its order item.
+    rows = (db.session.query(order.order_id, item.order_item_id, item.product_id, item.quantity,
+                             shipment_item.warehouse_id, func.count(shipment_item.shipment_item_id).label('shipped'))
+            .outerjoin(item, item.order_id == order.order_id)
+            .outerjoin(shipment_item, shipment_item.order_item_id == item.order_item_id)
+            .filter(order.order_id.in_(order_ids))
+            .group_by(order.order_id, item.order_item_id, item.product_id, item.quantity, shipment_item.warehouse_id)
+            .order_by(order.order_id, item.order_item_id, shipment_item.warehouse_id)
+            .all())
+
+    orders = {}
+    for row in rows:
+        order = orders.get(row.order_id)
+        if order is None:
+            order = orders[row.order_id] = {'order_id': row.order_id, 'archived': graph is ARCHIVED,
+                                            'ordered': 0, 'shipped': 0, 'items': {}, 'warehouses': {}}
+        if row.order_item_id is None:
+            continue
+
+        item = order['items'].get(row.order_item_id)
+        if item is None:
+            item = order['items'][row.order_item_id] = {'order_item_id': row.order_item_id, 'product_id': row.product_id,
+                                                        'ordered': row.quantity or 0, 'shipped': 0, 'warehouses': []}
+            order['ordered'] += item['ordered']
+        if row.warehouse_id is not None:
+            item['shipped'] += row.shipped
+            item['warehouses'].append({'warehouse_id': row.warehouse_id, 'shipped': row.shipped})
+            order['shipped'] += row.shipped
+            order['warehouses'][row.warehouse_id] = order['warehouses'].get(row.warehouse_id, 0) + row.shipped
+
+    for order in orders.values():
+        items = list(order['items'].values())
+        for item in items:
+            item['remaining'] = max(item['ordered'] - item['shipped'], 0)
+            item['status'] = _status(item['remaining'], item['shipped'])
+        order['items'] = items
+        order['remaining'] = sum(item['remaining'] for item in items)
+        order['status'] = _status(order['remaining'], order['shipped'])
+        order['warehouses'] = [{'warehouse_id': warehouse_id, 'shipped': shipped}
+                               for warehouse_id, shipped in sorted(order['warehouses'].items())]
+    return orders
+
+
+def load_fulfillment(order_ids, archived=False):
+    orders = _aggregate(order_ids)
+    # The archive is only read for ids the hot tables did not have.
+    missing = set(order_ids) - set(orders)
+    if archived and missing:
+        orders.update(_aggregate(missing, ARCHIVED))
+    return [orders[order_id] for order_id in sorted(orders)]
+
+
+def load_unfulfilled(limit, cursor=None):
+    after = 0
+    if cursor:
+        try:
+            after = coerce(Order.order_id, decode_cursor(cursor, 1)[0])
+        except (ArithmeticError, TypeError, ValueError):
+            raise InvalidCursor(cursor)
+    batch_size = current_app.config['FULFILLMENT_BATCH_SIZE']
+    budget = current_app.config['FULFILLMENT_SCAN_MAX']
+    page = []
+    while len(page) < limit and budget > 0:
+        order_ids = [order_id for order_id, in (db.session.query(Order.order_id)
+                                                .filter(Order.order_id > after)
+                                                .order_by(Order.order_id)
+                                                .limit(min(batch_size, budget))
+                                                .all())]
+        if not order_ids:
+            return page, None
+
+        orders = _aggregate(order_ids)
+        for order_id in order_ids:
+            after = order_id
+            if orders[order_id]['remaining']:
+                page.append(orders[order_id])
+                if len(page) == limit:
+                    break
+        budget -= len(order_ids)
+
+    # A page cut short by the scan budget still hands back a cursor so the client can keep walking.
+    return page, encode_cursor([after])
@@ -0,0 +1,111 @@
+import uuid
+
+import click
+from flask import current_app, jsonify, request
+from flask.cli import AppGroup
+from sqlalchemy import and_, bindparam, column, func, select, table
+
+import archive
+from models import db, GUID, Customer, Order, OrderItem
+from serializers import InvalidFields, Serializer, get_serializer, json_response
+
+COLUMNS = {Customer: 'customer_guid', Order: 'order_guid', OrderItem: 'order_item_guid'}
+ARCHIVED = {model: Serializer(archive.MODELS[model], get_serializer(model).default_fields) for model in (Order, OrderItem)}
+
+
+def parse_guids(raw, limit):
+    try:
+        guids = [str(uuid.UUID(value.strip())) for value in raw.split(',') if value.strip()]
+    except ValueError:
+        return None
+    if not guids or len(guids) > limit:
+        return None
+    return list(dict.fromkeys(guids))
+
+
+def _rows(serializer, name, guids, fields):
+    # The guid rides along like a sort key, so rows can be matched back even when the caller did not ask for it.
+    columns = serializer.columns(fields, (name,))
+    position = fields.index(name) if name in fields else len(fields)
+    return {row[position]: dict(zip(fields, row))
+            for row in db.session.query(*columns).filter(serializer.attributes[name].in_(guids))}
+
+
+def load_by_guid(model, guids, fields, archived=False):
+    name = COLUMNS[model]
+    rows = _rows(get_serializer(model), name, guids, fields)
+    missing = [guid for guid in guids if guid not in rows]
+    if archived and missing and model in ARCHIVED:
+        rows.update(_rows(ARCHIVED[model], name, missing, fields))
+    return [rows[guid] for guid in guids if guid in rows]
+
+
+def guid_response(model, not_found, guid=None, archived=False):
+    try:
+        fields = get_serializer(model).parse_fields(request.args.get('fields'))
+    except InvalidFields as error:
+        return jsonify({'message': 'Campos desconocidos: ' + ', '.join(error.args[0])}), 400
+
+    if guid is None:
+        guids = parse_guids(request.args.get('guids', ''), current_app.config['PAGE_SIZE_MAX'])
+        if guids is None:
+            return jsonify({'message': 'Parámetro guids inválido'}), 400
+        return json_response(load_by_guid(model, guids, fields, archived))
+
+    guids = parse_guids(guid, 1)
+    if guids is None:
+        return jsonify({'message': 'GUID inválido'}), 400
+    rows = load_by_guid(model, guids, fields, archived)
+    if not rows:
+        return jsonify({'message': not_found}), 404
+    return json_response(rows[0])
+
+
+def _staging(model):
+    pk = model.__mapper__.primary_key[0].name
+    name = COLUMNS[model]
+    return table(model.__tablename__, column(pk), column(name), column(f'{name}_bin', GUID())), pk, name
+
+
+def backfill(model):
+    # Runs between 006 and 007: copies the CHAR(36) guids into their BINARY(16) staging column one PK range at a time.
+    staging, pk, name = _staging(model)
+    target = staging.c[f'{name}_bin']
+    statement = staging.update().where(staging.c[pk] == bindparam('k')).values({target: bindparam('v', type_=GUID())})
+    chunk = current_app.config['GUID_BACKFILL_CHUNK_SIZE']
+    highest = db.session.execute(select(func.max(staging.c[pk]))).scalar() or 0
+    converted, invalid = 0, []
+    low = 0
+    while low < highest:
+        high = low + chunk
+        rows = db.session.execute(select(staging.c[pk], staging.c[name])
+                                  .where(and_(staging.c[pk] > low, staging.c[pk] <= high,
+                                              staging.c[name].isnot(None), target.is_(None)))).all()
+        batch = []
+        for key, value in rows:
+            try:
+                batch.append({'k': key, 'v': uuid.UUID(value)})
+            except ValueError:
+                invalid.append(key)
+        if batch:
+            db.session.execute(statement, batch)
+            converted += len(batch)
+        db.session.commit()
+        low = high
+    return converted, invalid
+
+
+cli = AppGroup('guids', help='Convert stored GUIDs to BINARY(16).')
+
+
+@cli.command('backfill', help='Fill the *_guid_bin staging columns added by migrations/006_binary_guids.sql.')
+def backfill_command():
+    for model in COLUMNS:
+        converted, invalid = backfill(model)
+        click.echo(f'{model.__tablename__}: {converted} GUIDs convertidos, {len(invalid)} inválidos')
+        if invalid:
+            click.echo('  ids con GUID inválido: ' + ', '.join(map(str, invalid[:100])))
+
+
+def init_app(app):
+    app.cli.add_command(cli)
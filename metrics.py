@@ -0,0 +1,132 @@
+import bisect
+import contextlib
+import logging
+import threading
+import time
+
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+
+def _log_linear(lowest, highest, steps):
+    bounds = []
+    value = lowest
+    while value < highest:
+        for step in range(steps):
+            bounds.append(round(value * (1 + step / steps), 9))
+        value *= 2
+    return bounds
+
+
+SECONDS = _log_linear(0.0001, 60, 2)
+COUNTS = [1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144, 233, 377, 610, 987]
+
+
+class Histogram:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+HISTOGRAMS = {
+    'http_request_duration_seconds': ('Total request latency', SECONDS),
+    'http_request_db_seconds': ('Time spent executing SQL per request', SECONDS),
+    'http_request_serialization_seconds': ('Time spent serializing responses', SECONDS),
+    'http_request_queries': ('SQL statements issued per request', COUNTS),
+}
+
+_lock = threading.Lock()
+_series = {}
+
+
+def observe(name, labels, value):
+    with _lock:
+        histogram = _series.get((name, labels))
+        if histogram is None:
+            histogram = _series[(name, labels)] = Histogram(HISTOGRAMS[name][1])
+        histogram.observe(value)
+
+
+def _format_labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    return '{' + ','.join(f'{key}="{value}"' for key, value in pairs) + '}'
+
+
+def render():
+    lines = []
+    with _lock:
+        for name, (description, _) in HISTOGRAMS.items():
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} histogram')
+            for (series_name, labels), histogram in sorted(_series.items()):
+                if series_name != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(histogram.bounds, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_format_labels(labels, le=bound)} {cumulative}')
+                lines.append(f'{name}_bucket{_format_labels(labels, le="+Inf")} {histogram.count}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {histogram.total}')
+                lines.append(f'{name}_count{_format_labels(labels)} {histogram.count}')
+    return '\n'.join(lines) + '\n'
+
+
+@contextlib.contextmanager
+def timed(phase):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if has_request_context() and 'request_stats' in g:
+            g.request_stats[phase] += time.perf_counter() - start
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()
+    if has_request_context() and 'request_stats' in g:
+        g.request_stats['queries'] += 1
+        g.request_stats['db'] += elapsed
+    if has_app_context() and elapsed * 1000 >= current_app.config['SLOW_QUERY_MS']:
+        logger.warning('Slow query (%.1f ms): %s', elapsed * 1000, statement[:1000])
+
+
+def _before_request():
+    g.request_stats = {'start': time.perf_counter(), 'queries': 0, 'db': 0.0, 'serialize': 0.0}
+
+
+def _after_request(response):
+    stats = g.pop('request_stats', None)
+    if stats is None:
+        return response
+
+    total = time.perf_counter() - stats['start']
+    labels = (('method', request.method), ('route', request.url_rule.rule if request.url_rule else 'unmatched'))
+    observe('http_request_duration_seconds', labels, total)
+    observe('http_request_db_seconds', labels, stats['db'])
+    observe('http_request_serialization_seconds', labels, stats['serialize'])
+    observe('http_request_queries', labels, stats['queries'])
+    response.headers['Server-Timing'] = (f'db;dur={stats["db"] * 1000:.2f};desc="{stats["queries"]} queries", '
+                                         f'serialize;dur={stats["serialize"] * 1000:.2f}, '
+                                         f'total;dur={total * 1000:.2f}')
+    return response
+
+
+def init_app(app):
+    app.before_request(_before_request)
+    app.after_request(_after_request)
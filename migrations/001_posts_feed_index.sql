@@ -0,0 +1,3 @@
+-- Feed reads walk each followed author's newest posts.
+-- follows(following_user_id) is already the leading column of the primary key.
+CREATE INDEX ix_posts_user_id_created_at ON posts (user_id, created_at);
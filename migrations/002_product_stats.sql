@@ -0,0 +1,11 @@
+-- Per-product counters kept in step with order_items and product_reviews writes.
+-- Backfill with `flask product-stats rebuild` once the table exists.
+CREATE TABLE product_stats (
+    product_id INTEGER NOT NULL PRIMARY KEY,
+    units_sold INTEGER NOT NULL DEFAULT 0,
+    review_count INTEGER NOT NULL DEFAULT 0,
+    approved_review_count INTEGER NOT NULL DEFAULT 0,
+    FOREIGN KEY (product_id) REFERENCES products (product_id)
+);
+CREATE INDEX ix_product_stats_units_sold ON product_stats (units_sold);
+CREATE INDEX ix_product_stats_review_count ON product_stats (review_count);
@@ -0,0 +1,12 @@
+-- Row versions for If-Match checks on PATCH; the ORM bumps them on every update.
+ALTER TABLE users ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE posts ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE customers ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE products ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE categories ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE orders ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE order_items ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE shipments ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE warehouses ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE shipment_items ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE product_reviews ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
@@ -0,0 +1,19 @@
+-- Indexes behind the list filters declared in serializers.py.
+-- On MySQL each one replaces the implicit index InnoDB created for the foreign key, so nothing is indexed twice.
+CREATE INDEX ix_users_username ON users (username);
+CREATE INDEX ix_follows_followed_user_id ON follows (followed_user_id);
+CREATE INDEX ix_customers_email ON customers (email);
+CREATE INDEX ix_products_product_type_id ON products (product_type_id);
+CREATE INDEX ix_categories_parent_category_id ON categories (parent_category_id);
+CREATE INDEX ix_product_category_map_product_id ON product_category_map (product_id);
+CREATE INDEX ix_product_category_map_category_id ON product_category_map (category_id);
+CREATE INDEX ix_orders_customer_id ON orders (customer_id);
+CREATE INDEX ix_order_items_order_id ON order_items (order_id);
+CREATE INDEX ix_order_items_product_id ON order_items (product_id);
+CREATE INDEX ix_shipments_order_id ON shipments (order_id);
+CREATE INDEX ix_shipments_tracking_number ON shipments (tracking_number);
+CREATE INDEX ix_shipment_items_shipment_id ON shipment_items (shipment_id);
+CREATE INDEX ix_shipment_items_order_item_id ON shipment_items (order_item_id);
+CREATE INDEX ix_shipment_items_warehouse_id ON shipment_items (warehouse_id);
+CREATE INDEX ix_product_reviews_customer_id ON product_reviews (customer_id);
+CREATE INDEX ix_product_reviews_product_id ON product_reviews (product_id);
@@ -0,0 +1,14 @@
+-- Change feed behind GET /changes. seq is never reused; pruning always leaves the newest expired entry behind.
+CREATE TABLE change_log (
+    seq BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    table_name VARCHAR(64) NOT NULL,
+    operation CHAR(1) NOT NULL,
+    row_key VARCHAR(255) NOT NULL,
+    created_at DATETIME NOT NULL
+);
+CREATE INDEX ix_change_log_table_name_row_key ON change_log (table_name, row_key);
+
+CREATE TABLE change_log_watermark (
+    name VARCHAR(64) NOT NULL PRIMARY KEY,
+    seq BIGINT NOT NULL
+);
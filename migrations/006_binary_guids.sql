@@ -0,0 +1,4 @@
+-- Step 1 of 2: BINARY(16) staging columns for the GUIDs. Fill them with `flask guids backfill`, then apply 007.
+ALTER TABLE customers ADD COLUMN customer_guid_bin BINARY(16) NULL;
+ALTER TABLE orders ADD COLUMN order_guid_bin BINARY(16) NULL;
+ALTER TABLE order_items ADD COLUMN order_item_guid_bin BINARY(16) NULL;
@@ -0,0 +1,7 @@
+-- Step 2 of 2: swap the backfilled BINARY(16) columns in and index them. Rerun the backfill right before this to catch late writes.
+ALTER TABLE customers DROP COLUMN customer_guid, RENAME COLUMN customer_guid_bin TO customer_guid;
+ALTER TABLE orders DROP COLUMN order_guid, RENAME COLUMN order_guid_bin TO order_guid;
+ALTER TABLE order_items DROP COLUMN order_item_guid, RENAME COLUMN order_item_guid_bin TO order_item_guid;
+CREATE UNIQUE INDEX ix_customers_customer_guid ON customers (customer_guid);
+CREATE UNIQUE INDEX ix_orders_order_guid ON orders (order_guid);
+CREATE UNIQUE INDEX ix_order_items_order_item_guid ON order_items (order_item_guid);
@@ -0,0 +1,53 @@
+-- Archive for fully shipped orders, filled by `flask archive orders`. Ids are copied from the hot tables, never generated.
+CREATE TABLE archived_orders (
+    order_id INTEGER NOT NULL PRIMARY KEY,
+    order_guid BINARY(16) NULL,
+    store_id INTEGER NULL,
+    customer_id INTEGER NOT NULL,
+    billing_address_id INTEGER NULL,
+    shipping_address_id INTEGER NULL,
+    version INTEGER NOT NULL DEFAULT 1,
+    FOREIGN KEY (customer_id) REFERENCES customers (customer_id)
+);
+CREATE UNIQUE INDEX ix_archived_orders_order_guid ON archived_orders (order_guid);
+CREATE INDEX ix_archived_orders_customer_id ON archived_orders (customer_id);
+
+CREATE TABLE archived_order_items (
+    order_item_id INTEGER NOT NULL PRIMARY KEY,
+    order_item_guid BINARY(16) NULL,
+    order_id INTEGER NOT NULL,
+    product_id INTEGER NOT NULL,
+    quantity INTEGER NULL,
+    version INTEGER NOT NULL DEFAULT 1,
+    FOREIGN KEY (order_id) REFERENCES archived_orders (order_id),
+    FOREIGN KEY (product_id) REFERENCES products (product_id)
+);
+CREATE UNIQUE INDEX ix_archived_order_items_order_item_guid ON archived_order_items (order_item_guid);
+CREATE INDEX ix_archived_order_items_order_id ON archived_order_items (order_id);
+CREATE INDEX ix_archived_order_items_product_id ON archived_order_items (product_id);
+
+CREATE TABLE archived_shipments (
+    shipment_id INTEGER NOT NULL PRIMARY KEY,
+    order_id INTEGER NOT NULL,
+    tracking_number VARCHAR(255) NULL,
+    total_weight NUMERIC(18, 2) NULL,
+    shipped_date_utc DATETIME NULL,
+    version INTEGER NOT NULL DEFAULT 1,
+    FOREIGN KEY (order_id) REFERENCES archived_orders (order_id)
+);
+CREATE INDEX ix_archived_shipments_order_id ON archived_shipments (order_id);
+CREATE INDEX ix_archived_shipments_tracking_number ON archived_shipments (tracking_number);
+
+CREATE TABLE archived_shipment_items (
+    shipment_item_id INTEGER NOT NULL PRIMARY KEY,
+    shipment_id INTEGER NOT NULL,
+    order_item_id INTEGER NOT NULL,
+    warehouse_id INTEGER NOT NULL,
+    version INTEGER NOT NULL DEFAULT 1,
+    FOREIGN KEY (shipment_id) REFERENCES archived_shipments (shipment_id),
+    FOREIGN KEY (order_item_id) REFERENCES archived_order_items (order_item_id),
+    FOREIGN KEY (warehouse_id) REFERENCES warehouses (warehouse_id)
+);
+CREATE INDEX ix_archived_shipment_items_shipment_id ON archived_shipment_items (shipment_id);
+CREATE INDEX ix_archived_shipment_items_order_item_id ON archived_shipment_items (order_item_id);
+CREATE INDEX ix_archived_shipment_items_warehouse_id ON archived_shipment_items (warehouse_id);
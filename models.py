@@ -1,14 +1,48 @@
-from flask_sqlalchemy import SQLAlchemy
+import uuid
 
-db = SQLAlchemy()
+from sqlalchemy.types import BINARY, TypeDecorator
+
+from routing import RoutingSQLAlchemy
+
+db = RoutingSQLAlchemy(session_options={'expire_on_commit': False})
+
+class InvalidGUID(ValueError):
+    pass
+
+# GUIDs travel as canonical strings but are stored in 16 bytes, half the width of CHAR(36) in every index that holds them.
+class GUID(TypeDecorator):
+    impl = BINARY(16)
+    cache_ok = True
+
+    @property
+    def python_type(self):
+        return str
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, bytes):
+            return value
+        if isinstance(value, uuid.UUID):
+            return value.bytes
+        try:
+            return uuid.UUID(str(value)).bytes
+        except ValueError:
+            raise InvalidGUID(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return str(uuid.UUID(bytes=bytes(value)))
 
 # ----- USERS -----
 class User(db.Model):
     __tablename__ = 'users'
     user_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    username = db.Column(db.String(255), nullable=False)
+    username = db.Column(db.String(255), nullable=False, index=True)
     role = db.Column(db.String(50))
     created_at = db.Column(db.TIMESTAMP, default=db.func.current_timestamp())
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    __mapper_args__ = {'version_id_col': version}
 
 # ----- POSTS -----
 class Post(db.Model):
@@ -19,33 +53,43 @@ class Post(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
     status = db.Column(db.String(50))
     created_at = db.Column(db.TIMESTAMP, default=db.func.current_timestamp())
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
 
     user = db.relationship('User', backref=db.backref('posts', lazy=True))
 
+    __table_args__ = (db.Index('ix_posts_user_id_created_at', 'user_id', 'created_at'),)
+    __mapper_args__ = {'version_id_col': version}
+
 # ----- FOLLOWS -----
 class Follow(db.Model):
     __tablename__ = 'follows'
     following_user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), primary_key=True)
-    followed_user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), primary_key=True)
+    followed_user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), primary_key=True, index=True)
     created_at = db.Column(db.TIMESTAMP, default=db.func.current_timestamp())
 
 # ----- CUSTOMERS -----
 class Customer(db.Model):
     __tablename__ = 'customers'
     customer_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    customer_guid = db.Column(db.String(36))
+    customer_guid = db.Column(GUID, unique=True, index=True)
     username = db.Column(db.String(255), nullable=False)
-    email = db.Column(db.String(255), nullable=False)
+    email = db.Column(db.String(255), nullable=False, index=True)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    __mapper_args__ = {'version_id_col': version}
 
 # ----- PRODUCTS -----
 class Product(db.Model):
     __tablename__ = 'products'
     product_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    product_type_id = db.Column(db.Integer)
+    product_type_id = db.Column(db.Integer, index=True)
     parent_grouped_product_id = db.Column(db.Integer)
     visible_individually = db.Column(db.Boolean)
     name = db.Column(db.String(255), nullable=False)
     short_description = db.Column(db.String(1000))
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    __mapper_args__ = {'version_id_col': version}
 
 # ----- CATEGORIES -----
 class Category(db.Model):
@@ -53,16 +97,19 @@ class Category(db.Model):
     category_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     meta_description = db.Column(db.String(1000))
     meta_title = db.Column(db.String(255))
-    parent_category_id = db.Column(db.Integer)
+    parent_category_id = db.Column(db.Integer, index=True)
     picture_id = db.Column(db.Integer)
     page_size = db.Column(db.Integer)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    __mapper_args__ = {'version_id_col': version}
 
 # ----- PRODUCT CATEGORY MAP -----
 class ProductCategoryMap(db.Model):
     __tablename__ = 'product_category_map'
     map_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    product_id = db.Column(db.Integer, db.ForeignKey('products.product_id'), nullable=False)
-    category_id = db.Column(db.Integer, db.ForeignKey('categories.category_id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.product_id'), nullable=False, index=True)
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.category_id'), nullable=False, index=True)
     is_featured_product = db.Column(db.Boolean)
     display_order = db.Column(db.Integer)
 
@@ -73,37 +120,46 @@ class ProductCategoryMap(db.Model):
 class Order(db.Model):
     __tablename__ = 'orders'
     order_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    order_guid = db.Column(db.String(36))
+    order_guid = db.Column(GUID, unique=True, index=True)
     store_id = db.Column(db.Integer, unique=True)
-    customer_id = db.Column(db.Integer, db.ForeignKey('customers.customer_id'), nullable=False)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customers.customer_id'), nullable=False, index=True)
     billing_address_id = db.Column(db.Integer)
     shipping_address_id = db.Column(db.Integer)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
 
     customer = db.relationship('Customer', backref=db.backref('orders', lazy=True))
 
+    __mapper_args__ = {'version_id_col': version}
+
 # ----- ORDER ITEMS -----
 class OrderItem(db.Model):
     __tablename__ = 'order_items'
     order_item_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    order_item_guid = db.Column(db.String(36))
-    order_id = db.Column(db.Integer, db.ForeignKey('orders.order_id'), nullable=False)
-    product_id = db.Column(db.Integer, db.ForeignKey('products.product_id'), nullable=False)
+    order_item_guid = db.Column(GUID, unique=True, index=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.order_id'), nullable=False, index=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.product_id'), nullable=False, index=True)
     quantity = db.Column(db.Integer)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
 
     order = db.relationship('Order', backref=db.backref('order_items', lazy=True))
     product = db.relationship('Product', backref=db.backref('order_items', lazy=True))
 
+    __mapper_args__ = {'version_id_col': version}
+
 # ----- SHIPMENTS -----
 class Shipment(db.Model):
     __tablename__ = 'shipments'
     shipment_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    order_id = db.Column(db.Integer, db.ForeignKey('orders.order_id'), nullable=False)
-    tracking_number = db.Column(db.String(255))
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.order_id'), nullable=False, index=True)
+    tracking_number = db.Column(db.String(255), index=True)
     total_weight = db.Column(db.Numeric(18, 2))
     shipped_date_utc = db.Column(db.DateTime)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
 
     order = db.relationship('Order', backref=db.backref('shipments', lazy=True))
 
+    __mapper_args__ = {'version_id_col': version}
+
 # ----- WAREHOUSES -----
 class Warehouse(db.Model):
     __tablename__ = 'warehouses'
@@ -111,28 +167,110 @@ class Warehouse(db.Model):
     name = db.Column(db.String(255))
     admin_comment = db.Column(db.String(1000))
     address_id = db.Column(db.Integer)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    __mapper_args__ = {'version_id_col': version}
 
 # ----- SHIPMENT ITEMS -----
 class ShipmentItem(db.Model):
     __tablename__ = 'shipment_items'
     shipment_item_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    shipment_id = db.Column(db.Integer, db.ForeignKey('shipments.shipment_id'), nullable=False)
-    order_item_id = db.Column(db.Integer, db.ForeignKey('order_items.order_item_id'), nullable=False)
-    warehouse_id = db.Column(db.Integer, db.ForeignKey('warehouses.warehouse_id'), nullable=False)
+    shipment_id = db.Column(db.Integer, db.ForeignKey('shipments.shipment_id'), nullable=False, index=True)
+    order_item_id = db.Column(db.Integer, db.ForeignKey('order_items.order_item_id'), nullable=False, index=True)
+    warehouse_id = db.Column(db.Integer, db.ForeignKey('warehouses.warehouse_id'), nullable=False, index=True)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
 
     shipment = db.relationship('Shipment', backref=db.backref('shipment_items', lazy=True))
     order_item = db.relationship('OrderItem', backref=db.backref('shipment_items', lazy=True))
     warehouse = db.relationship('Warehouse', backref=db.backref('shipment_items', lazy=True))
 
+    __mapper_args__ = {'version_id_col': version}
+
 # ----- PRODUCT REVIEWS -----
 class ProductReview(db.Model):
     __tablename__ = 'product_reviews'
     review_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    customer_id = db.Column(db.Integer, db.ForeignKey('customers.customer_id'), nullable=False)
-    product_id = db.Column(db.Integer, db.ForeignKey('products.product_id'), nullable=False)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customers.customer_id'), nullable=False, index=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.product_id'), nullable=False, index=True)
     is_approved = db.Column(db.Boolean)
     title = db.Column(db.String(255))
     review_text = db.Column(db.String(2000))
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
 
     customer = db.relationship('Customer', backref=db.backref('product_reviews', lazy=True))
     product = db.relationship('Product', backref=db.backref('product_reviews', lazy=True))
+
+    __mapper_args__ = {'version_id_col': version}
+
+# ----- ARCHIVE -----
+# Fully shipped orders leave the hot tables with their items, shipments and shipment items (see archive.py).
+class ArchivedOrder(db.Model):
+    __tablename__ = 'archived_orders'
+    order_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    order_guid = db.Column(GUID, unique=True, index=True)
+    store_id = db.Column(db.Integer)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customers.customer_id'), nullable=False, index=True)
+    billing_address_id = db.Column(db.Integer)
+    shipping_address_id = db.Column(db.Integer)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    customer = db.relationship('Customer')
+
+class ArchivedOrderItem(db.Model):
+    __tablename__ = 'archived_order_items'
+    order_item_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    order_item_guid = db.Column(GUID, unique=True, index=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('archived_orders.order_id'), nullable=False, index=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.product_id'), nullable=False, index=True)
+    quantity = db.Column(db.Integer)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    order = db.relationship('ArchivedOrder', backref=db.backref('order_items', lazy=True))
+    product = db.relationship('Product')
+
+class ArchivedShipment(db.Model):
+    __tablename__ = 'archived_shipments'
+    shipment_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('archived_orders.order_id'), nullable=False, index=True)
+    tracking_number = db.Column(db.String(255), index=True)
+    total_weight = db.Column(db.Numeric(18, 2))
+    shipped_date_utc = db.Column(db.DateTime)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    order = db.relationship('ArchivedOrder', backref=db.backref('shipments', lazy=True))
+
+class ArchivedShipmentItem(db.Model):
+    __tablename__ = 'archived_shipment_items'
+    shipment_item_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    shipment_id = db.Column(db.Integer, db.ForeignKey('archived_shipments.shipment_id'), nullable=False, index=True)
+    order_item_id = db.Column(db.Integer, db.ForeignKey('archived_order_items.order_item_id'), nullable=False, index=True)
+    warehouse_id = db.Column(db.Integer, db.ForeignKey('warehouses.warehouse_id'), nullable=False, index=True)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    shipment = db.relationship('ArchivedShipment', backref=db.backref('shipment_items', lazy=True))
+    order_item = db.relationship('ArchivedOrderItem', backref=db.backref('shipment_items', lazy=True))
+    warehouse = db.relationship('Warehouse')
+
+# ----- PRODUCT STATS -----
+class ProductStats(db.Model):
+    __tablename__ = 'product_stats'
+    product_id = db.Column(db.Integer, db.ForeignKey('products.product_id'), primary_key=True)
+    units_sold = db.Column(db.Integer, nullable=False, default=0, index=True)
+    review_count = db.Column(db.Integer, nullable=False, default=0, index=True)
+    approved_review_count = db.Column(db.Integer, nullable=False, default=0)
+
+# ----- CHANGE LOG -----
+class ChangeLog(db.Model):
+    __tablename__ = 'change_log'
+    seq = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True, autoincrement=True)
+    table_name = db.Column(db.String(64), nullable=False)
+    operation = db.Column(db.String(1), nullable=False)
+    row_key = db.Column(db.String(255), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (db.Index('ix_change_log_table_name_row_key', 'table_name', 'row_key'), {'sqlite_autoincrement': True})
+
+class ChangeLogWatermark(db.Model):
+    __tablename__ = 'change_log_watermark'
+    name = db.Column(db.String(64), primary_key=True)
+    seq = db.Column(db.BigInteger, nullable=False)
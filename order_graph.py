@@ -0,0 +1,77 @@
+from sqlalchemy.orm import joinedload, selectinload
+
+from models import (Order, OrderItem, Shipment, ShipmentItem,
+                    ArchivedOrder, ArchivedOrderItem, ArchivedShipment, ArchivedShipmentItem)
+
+HOT = (Order, OrderItem, Shipment, ShipmentItem)
+ARCHIVED = (ArchivedOrder, ArchivedOrderItem, ArchivedShipment, ArchivedShipmentItem)
+
+
+def _load(graph, ids):
+    order, item, shipment, shipment_item = graph
+    return (order.query
+            .options(joinedload(order.customer),
+                     selectinload(order.order_items).joinedload(item.product),
+                     selectinload(order.shipments).selectinload(shipment.shipment_items).joinedload(shipment_item.warehouse))
+            .filter(order.order_id.in_(ids))
+            .order_by(order.order_id)
+            .all())
+
+
+def load_orders(ids, archived=False):
+    orders = _load(HOT, ids)
+    # The archive is only read for ids the hot tables did not have.
+    missing = set(ids) - {order.order_id for order in orders}
+    if archived and missing:
+        orders = sorted(orders + _load(ARCHIVED, missing), key=lambda order: order.order_id)
+    return orders
+
+
+def parse_ids(raw, limit):
+    try:
+        ids = [int(value) for value in raw.split(',') if value.strip()]
+    except ValueError:
+        return None
+    if not ids or len(ids) > limit:
+        return None
+    return ids
+
+
+def _serialize_item(item):
+    product = item.product
+    return {
+        'order_item_id': item.order_item_id,
+        'order_item_guid': item.order_item_guid,
+        'product_id': item.product_id,
+        'quantity': item.quantity,
+        'product': {'product_id': product.product_id, 'name': product.name, 'short_description': product.short_description},
+    }
+
+
+def _serialize_shipment(shipment):
+    return {
+        'shipment_id': shipment.shipment_id,
+        'tracking_number': shipment.tracking_number,
+        'total_weight': float(shipment.total_weight) if shipment.total_weight is not None else None,
+        'shipped_date_utc': shipment.shipped_date_utc,
+        'shipment_items': [{
+            'shipment_item_id': item.shipment_item_id,
+            'order_item_id': item.order_item_id,
+            'warehouse': {'warehouse_id': item.warehouse.warehouse_id, 'name': item.warehouse.name},
+        } for item in shipment.shipment_items],
+    }
+
+
+def serialize_order(order):
+    customer = order.customer
+    return {
+        'order_id': order.order_id,
+        'order_guid': order.order_guid,
+        'archived': isinstance(order, ArchivedOrder),
+        'store_id': order.store_id,
+        'billing_address_id': order.billing_address_id,
+        'shipping_address_id': order.shipping_address_id,
+        'customer': {'customer_id': customer.customer_id, 'username': customer.username, 'email': customer.email},
+        'order_items': [_serialize_item(item) for item in order.order_items],
+        'shipments': [_serialize_shipment(shipment) for shipment in order.shipments],
+    }
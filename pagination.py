@@ -0,0 +1,156 @@
+import base64
+from datetime import date
+from decimal import Decimal
+
+from flask import Response, current_app, json, jsonify, request, stream_with_context
+from sqlalchemy import and_, or_
+
+from filters import InvalidFilter, coerce, parse_filters, parse_sort
+from metrics import timed
+from serializers import InvalidFields, dumps, get_serializer, json_response
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    raw = json.dumps(list(values), separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except ValueError:
+        raise InvalidCursor(cursor)
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursor(cursor)
+    return values
+
+
+def page_limit():
+    limit = request.args.get('limit', current_app.config['PAGE_SIZE_DEFAULT'], type=int)
+    return max(1, min(limit, current_app.config['PAGE_SIZE_MAX']))
+
+
+def wants_page():
+    return 'limit' in request.args or 'cursor' in request.args
+
+
+def wants_stream():
+    if request.args.get('stream') == '1':
+        return True
+    return request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson']) == 'application/x-ndjson'
+
+
+def sort_keys(serializer, sort=()):
+    # The primary key always closes the ordering so every row has a unique position.
+    ordering = dict(sort)
+    return tuple(sort) + tuple((name, False) for name in serializer.primary_key if name not in ordering)
+
+
+def order_by(serializer, keys):
+    clauses = []
+    for name, descending in keys:
+        column = serializer.attributes[name]
+        # NULLs sort last in both directions, spelled portably.
+        if name in serializer.nullable:
+            clauses.append(column.is_(None))
+        clauses.append(column.desc() if descending else column)
+    return clauses
+
+
+def keyset(serializer, keys, cursor):
+    values = decode_cursor(cursor, len(keys))
+    clauses, equal = [], []
+    for (name, descending), value in zip(keys, values):
+        column = serializer.attributes[name]
+        if value is None:
+            equal.append(column.is_(None))
+            continue
+        try:
+            value = coerce(column, value)
+        except (ArithmeticError, TypeError, ValueError):
+            raise InvalidCursor(cursor)
+        after = column < value if descending else column > value
+        if name in serializer.nullable:
+            after = or_(after, column.is_(None))
+        clauses.append(and_(*equal, after))
+        equal.append(column == value)
+    if not clauses:
+        raise InvalidCursor(cursor)
+    return or_(*clauses)
+
+
+def cursor_for(row, keys):
+    values = []
+    for name, _ in keys:
+        value = getattr(row, name)
+        if isinstance(value, date):
+            value = value.isoformat()
+        elif isinstance(value, Decimal):
+            value = str(value)
+        values.append(value)
+    return encode_cursor(values)
+
+
+def paginate(query, serializer, limit, cursor=None, sort=()):
+    keys = sort_keys(serializer, sort)
+    if cursor:
+        query = query.filter(keyset(serializer, keys, cursor))
+
+    rows = query.order_by(*order_by(serializer, keys)).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = cursor_for(rows[-1], keys)
+    return rows, next_cursor
+
+
+def stream_response(query, serializer, fields, sort=()):
+    batch_size = current_app.config['STREAM_BATCH_SIZE']
+    query = query.order_by(*order_by(serializer, sort_keys(serializer, sort)))
+    rows = query.execution_options(stream_results=True).yield_per(batch_size)
+
+    def generate():
+        lines = []
+        for row in rows:
+            lines.append(dumps(dict(zip(fields, row))))
+            if len(lines) >= batch_size:
+                yield b'\n'.join(lines) + b'\n'
+                lines = []
+        if lines:
+            yield b'\n'.join(lines) + b'\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+def list_response(model):
+    serializer = get_serializer(model)
+    try:
+        fields = serializer.parse_fields(request.args.get('fields'))
+    except InvalidFields as error:
+        return jsonify({'message': 'Campos desconocidos: ' + ', '.join(error.args[0])}), 400
+    try:
+        criteria = parse_filters(serializer, request.args)
+        sort = parse_sort(serializer, request.args.get('sort'))
+    except InvalidFilter as error:
+        return jsonify({'message': 'Filtro inválido: ' + error.args[0]}), 400
+    query = serializer.query(fields, [name for name, _ in sort]).filter(*criteria)
+
+    if wants_stream():
+        return stream_response(query, serializer, fields, sort)
+    if not wants_page():
+        if sort:
+            query = query.order_by(*order_by(serializer, sort_keys(serializer, sort)))
+        rows = query.all()
+        with timed('serialize'):
+            return json_response([dict(zip(fields, row)) for row in rows])
+
+    try:
+        rows, next_cursor = paginate(query, serializer, page_limit(), request.args.get('cursor'), sort)
+    except InvalidCursor:
+        return jsonify({'message': 'Cursor inválido'}), 400
+    with timed('serialize'):
+        return json_response({'items': [dict(zip(fields, row)) for row in rows], 'next_cursor': next_cursor})
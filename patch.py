@@ -0,0 +1,67 @@
+from flask import jsonify, request
+from sqlalchemy import inspect
+
+import change_log
+import product_stats
+from models import db
+
+
+def _expected_versions():
+    if 'If-Match' not in request.headers or request.if_match.star_tag:
+        return None
+    return {int(tag) for tag in request.if_match.as_set() if tag.isdigit()}
+
+
+def _message(text, status, version=None):
+    response = jsonify({'message': text} if version is None else {'message': text, 'version': version})
+    response.status_code = status
+    if version is not None:
+        response.set_etag(str(version))
+    return response
+
+
+def _patch_instance(model, id, values, expected, not_found, updated):
+    # Counters in product_stats need the old values, so these columns go through the ORM flush.
+    row = model.query.get(id)
+    if not row:
+        return _message(not_found, 404)
+    if expected is not None and row.version not in expected:
+        return _message('El recurso fue modificado por otra petición', 412)
+
+    for field, value in values.items():
+        setattr(row, field, value)
+    db.session.commit()
+    return _message(updated, 200, row.version)
+
+
+def patch_update(model, id, fields, not_found, updated):
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return _message('Cuerpo JSON inválido', 400)
+    unknown = [field for field in data if field not in fields]
+    if unknown:
+        return _message('Campos no modificables: ' + ', '.join(unknown), 400)
+    if not data:
+        return _message('Sin campos para actualizar', 400)
+
+    expected = _expected_versions()
+    if product_stats.tracks(model, data):
+        return _patch_instance(model, id, data, expected, not_found, updated)
+
+    table = model.__table__
+    pk = inspect(model).primary_key[0]
+    version = table.c.version
+    statement = table.update().where(pk == id).values(**data, version=version + 1)
+    if expected is not None:
+        statement = statement.where(version.in_(expected))
+    result = db.session.execute(statement)
+    if result.rowcount:
+        change_log.record(model, change_log.UPDATE, [(id,)])
+        db.session.commit()
+        return _message(updated, 200, next(iter(expected)) + 1 if expected and len(expected) == 1 else None)
+
+    # Only a failed write pays for the lookup that tells a missing row from a stale version.
+    db.session.rollback()
+    if db.session.query(pk).filter(pk == id).first() is None:
+        return _message(not_found, 404)
+    return _message('El recurso fue modificado por otra petición', 412)
@@ -0,0 +1,197 @@
+import click
+from flask.cli import AppGroup
+from sqlalchemy import case, event, func, inspect, or_, select, true, union_all
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from models import db, ArchivedOrderItem, OrderItem, Product, ProductCategoryMap, ProductReview, ProductStats
+
+COUNTERS = ('units_sold', 'review_count', 'approved_review_count')
+RANKINGS = {'sales': ProductStats.units_sold, 'reviews': ProductStats.review_count}
+UPSERTS = {'mysql': mysql.insert, 'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+
+class InvalidCounter(ValueError):
+    pass
+
+
+def _count(value):
+    # JSON bodies may carry "3" where the column coerces it; anything int() rejects would corrupt the totals.
+    if value is None:
+        return 0
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise InvalidCounter(value) from None
+
+
+# Each tracked model contributes (units_sold, review_count, approved_review_count) to its product.
+# Archiving an order does not unsell it, so archived items keep counting.
+CONTRIBUTIONS = {
+    OrderItem: (('product_id', 'quantity'), lambda values: (_count(values['quantity']), 0, 0)),
+    ArchivedOrderItem: (('product_id', 'quantity'), lambda values: (_count(values['quantity']), 0, 0)),
+    ProductReview: (('product_id', 'is_approved'), lambda values: (0, 1, 1 if values['is_approved'] else 0)),
+}
+
+
+def tracks(model, values):
+    return model in CONTRIBUTIONS and any(name in values for name in CONTRIBUTIONS[model][0])
+
+
+def countable(model, values):
+    if model not in CONTRIBUTIONS:
+        return True
+    try:
+        CONTRIBUTIONS[model][1](values)
+    except InvalidCounter:
+        return False
+    return True
+
+
+def _add(deltas, model, values, sign):
+    counters = CONTRIBUTIONS[model][1](values)
+    current = deltas.get(values['product_id'], (0, 0, 0))
+    deltas[values['product_id']] = tuple(total + sign * value for total, value in zip(current, counters))
+
+
+def _current(instance, names):
+    return {name: getattr(instance, name) for name in names}
+
+
+def _previous(instance, names):
+    state = inspect(instance)
+    values = {}
+    for name in names:
+        history = state.attrs[name].history
+        values[name] = history.deleted[0] if history.deleted else getattr(instance, name)
+    return values
+
+
+def apply(session, deltas):
+    rows = [{'product_id': product_id, **dict(zip(COUNTERS, counters))}
+            for product_id, counters in sorted(deltas.items()) if product_id is not None and any(counters)]
+    if not rows:
+        return
+
+    table = ProductStats.__table__
+    dialect = session.connection().dialect.name
+    factory = UPSERTS.get(dialect)
+    if factory is None:
+        for row in rows:
+            changes = {name: table.c[name] + row[name] for name in COUNTERS}
+            result = session.execute(table.update().where(table.c.product_id == row['product_id']).values(changes))
+            if not result.rowcount:
+                session.execute(table.insert().values(row))
+        return
+
+    # One multi-row upsert per flush, whatever the number of products touched.
+    statement = factory(table).values(rows)
+    if dialect == 'mysql':
+        statement = statement.on_duplicate_key_update({name: table.c[name] + statement.inserted[name] for name in COUNTERS})
+    else:
+        statement = statement.on_conflict_do_update(index_elements=[table.c.product_id],
+                                                    set_={name: table.c[name] + statement.excluded[name] for name in COUNTERS})
+    session.execute(statement)
+
+
+def record_inserts(model, rows):
+    if model not in CONTRIBUTIONS:
+        return
+    deltas = {}
+    for row in rows:
+        _add(deltas, model, row, 1)
+    apply(db.session, deltas)
+
+
+def record_deletes(model, rows, session=None):
+    if model not in CONTRIBUTIONS:
+        return
+    deltas = {}
+    for row in rows:
+        _add(deltas, model, row, -1)
+    apply(db.session if session is None else session, deltas)
+
+
+@event.listens_for(Session, 'before_flush')
+def _before_flush(session, flush_context, instances):
+    deltas = {}
+    with session.no_autoflush:
+        for instance in session.new:
+            model = type(instance)
+            if model in CONTRIBUTIONS:
+                _add(deltas, model, _current(instance, CONTRIBUTIONS[model][0]), 1)
+        for instance in session.dirty:
+            model = type(instance)
+            if model in CONTRIBUTIONS and session.is_modified(instance):
+                names = CONTRIBUTIONS[model][0]
+                _add(deltas, model, _previous(instance, names), -1)
+                _add(deltas, model, _current(instance, names), 1)
+        deleted_products = []
+        for instance in session.deleted:
+            model = type(instance)
+            if model in CONTRIBUTIONS:
+                _add(deltas, model, _previous(instance, CONTRIBUTIONS[model][0]), -1)
+            elif model is Product:
+                deleted_products.append(instance.product_id)
+
+    apply(session, deltas)
+    if deleted_products:
+        table = ProductStats.__table__
+        session.execute(table.delete().where(table.c.product_id.in_(deleted_products)))
+
+
+def rebuild():
+    items = union_all(select(OrderItem.product_id, OrderItem.quantity),
+                      select(ArchivedOrderItem.product_id, ArchivedOrderItem.quantity)).subquery()
+    sales = (select(items.c.product_id, func.sum(items.c.quantity).label('units_sold'))
+             .group_by(items.c.product_id)
+             .subquery())
+    reviews = (select(ProductReview.product_id,
+                      func.count().label('review_count'),
+                      func.count(case((ProductReview.is_approved == true(), 1))).label('approved_review_count'))
+               .group_by(ProductReview.product_id)
+               .subquery())
+    query = (select(Product.product_id,
+                    func.coalesce(sales.c.units_sold, 0),
+                    func.coalesce(reviews.c.review_count, 0),
+                    func.coalesce(reviews.c.approved_review_count, 0))
+             .outerjoin(sales, sales.c.product_id == Product.product_id)
+             .outerjoin(reviews, reviews.c.product_id == Product.product_id)
+             .where(or_(sales.c.product_id.isnot(None), reviews.c.product_id.isnot(None))))
+
+    table = ProductStats.__table__
+    db.session.execute(table.delete())
+    result = db.session.execute(table.insert().from_select(['product_id', *COUNTERS], query))
+    db.session.commit()
+    return result.rowcount
+
+
+def top(by, limit, category_ids=None):
+    column = RANKINGS[by]
+    query = (db.session.query(ProductStats, Product.name)
+             .join(Product, Product.product_id == ProductStats.product_id)
+             .filter(column > 0))
+    if category_ids is not None:
+        query = query.filter(ProductStats.product_id.in_(
+            select(ProductCategoryMap.product_id).where(ProductCategoryMap.category_id.in_(category_ids))))
+    # Both keys descend so the single-column ranking index can be read backwards.
+    rows = query.order_by(column.desc(), ProductStats.product_id.desc()).limit(limit).all()
+    return [{'product_id': stats.product_id,
+             'name': name,
+             'units_sold': stats.units_sold,
+             'review_count': stats.review_count,
+             'approved_review_count': stats.approved_review_count,
+             'approval_ratio': round(stats.approved_review_count / stats.review_count, 4) if stats.review_count else None}
+            for stats, name in rows]
+
+
+cli = AppGroup('product-stats', help='Maintain the pre-aggregated product statistics.')
+
+
+@cli.command('rebuild', help='Recompute every product from its order items and reviews.')
+def rebuild_command():
+    click.echo(f'{rebuild()} productos con estadísticas')
+
+
+def init_app(app):
+    app.cli.add_command(cli)
@@ -0,0 +1,113 @@
+import functools
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+from flask import current_app, request
+
+from pagination import wants_stream
+
+
+class MemoryBackend:
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.generations = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def generation(self, namespace):
+        with self.lock:
+            return self.generations.get(namespace, 0)
+
+    def bump(self, namespace):
+        with self.lock:
+            self.generations[namespace] = self.generations.get(namespace, 0) + 1
+
+
+class RedisBackend:
+    def __init__(self, url, ttl):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def get(self, key):
+        return self.client.get('cache:' + key)
+
+    def set(self, key, value):
+        self.client.set('cache:' + key, value, ex=self.ttl)
+
+    def generation(self, namespace):
+        return int(self.client.get('cache-gen:' + namespace) or 0)
+
+    def bump(self, namespace):
+        self.client.incr('cache-gen:' + namespace)
+
+
+def get_backend():
+    backend = current_app.extensions.get('response_cache')
+    if backend is None:
+        config = current_app.config
+        if config['CACHE_BACKEND'] == 'redis':
+            backend = RedisBackend(config['CACHE_REDIS_URL'], config['CACHE_TTL'])
+        else:
+            backend = MemoryBackend(config['CACHE_MAX_ENTRIES'], config['CACHE_TTL'])
+        current_app.extensions['response_cache'] = backend
+    return backend
+
+
+def cache_key(backend, namespace):
+    query = urlencode(sorted(request.args.items(multi=True)))
+    return f'{namespace}:{backend.generation(namespace)}:{request.path}?{query}'
+
+
+def cached(namespace):
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if wants_stream():
+                return view(*args, **kwargs)
+
+            backend = get_backend()
+            key = cache_key(backend, namespace)
+            body = backend.get(key)
+            if body is None:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                backend.set(key, response.get_data())
+                response.headers['X-Cache'] = 'MISS'
+            else:
+                response = current_app.response_class(body, mimetype='application/json')
+                response.headers['X-Cache'] = 'HIT'
+            response.add_etag()
+            return response.make_conditional(request)
+        return wrapper
+    return decorator
+
+
+def invalidate(*namespaces):
+    backend = get_backend()
+    for namespace in namespaces:
+        backend.bump(namespace)
@@ -0,0 +1,96 @@
+import itertools
+import threading
+import time
+
+from flask import current_app, has_request_context, request
+from flask_sqlalchemy import SignallingSession, SQLAlchemy
+from sqlalchemy import event, orm
+
+READ_METHODS = ('GET', 'HEAD')
+
+
+class ReplicaPool:
+    def __init__(self, db, app, keys, eject_seconds):
+        self.db = db
+        self.app = app
+        self.keys = keys
+        self.eject_seconds = eject_seconds
+        self.ejected_until = {}
+        self.engines = {}
+        self.cycle = itertools.cycle(keys)
+        self.lock = threading.Lock()
+
+    def engine(self, key):
+        with self.lock:
+            engine = self.engines.get(key)
+            if engine is None:
+                engine = self.engines[key] = self.db.get_engine(self.app, bind=key)
+                event.listen(engine, 'handle_error', lambda context: self.on_error(key, context))
+            return engine
+
+    def choose(self):
+        now = time.monotonic()
+        with self.lock:
+            for _ in range(len(self.keys)):
+                key = next(self.cycle)
+                if self.ejected_until.get(key, 0) <= now:
+                    return key
+        return None
+
+    def on_error(self, key, context):
+        # Only a replica that can't be reached is taken out; a bad statement would fail on any of them.
+        if context.is_disconnect or context.connection is None:
+            self.eject(key)
+
+    def eject(self, key):
+        with self.lock:
+            self.ejected_until[key] = time.monotonic() + self.eject_seconds
+
+
+def get_replica_pool(db):
+    app = current_app._get_current_object()
+    pool = app.extensions.get('replica_pool')
+    if pool is None:
+        keys = sorted(key for key in app.config['SQLALCHEMY_BINDS'] or {} if key.startswith('replica'))
+        pool = app.extensions['replica_pool'] = ReplicaPool(db, app, keys, app.config['REPLICA_EJECT_SECONDS'])
+    return pool
+
+
+class RoutingSession(SignallingSession):
+    def __init__(self, db, **options):
+        self.db = db
+        SignallingSession.__init__(self, db, **options)
+        event.listen(self, 'before_flush', self._mark_written)
+
+    @staticmethod
+    def _mark_written(session, flush_context, instances):
+        session.info['written'] = True
+
+    def _use_replica(self, clause):
+        if getattr(clause, 'is_dml', False):
+            self.info['written'] = True
+        if self.info.get('written') or self._flushing:
+            return False
+        return has_request_context() and request.method in READ_METHODS
+
+    def commit(self):
+        # A caller that owns the transaction (POST /batch) lets handlers flush into it instead of committing.
+        if self.info.get('defer_commit'):
+            self.flush()
+        else:
+            SignallingSession.commit(self)
+
+    def get_bind(self, mapper=None, clause=None):
+        if self._use_replica(clause):
+            pool = get_replica_pool(self.db)
+            key = self.info.get('replica')
+            if key is None or pool.ejected_until.get(key, 0) > time.monotonic():
+                key = self.info['replica'] = pool.choose()
+            if key is not None:
+                return pool.engine(key)
+        return SignallingSession.get_bind(self, mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
@@ -0,0 +1,204 @@
+import bisect
+import logging
+import math
+import re
+import threading
+import time
+import unicodedata
+
+from flask import current_app
+
+from models import db, Product, ProductReview
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    if not text:
+        return []
+    text = unicodedata.normalize('NFKD', text.lower())
+    return TOKEN_RE.findall(''.join(ch for ch in text if not unicodedata.combining(ch)))
+
+
+class InvertedIndex:
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}
+        self.terms = []
+        self.documents = {}
+        self.doc_terms = {}
+        self.total_length = 0
+        self.lock = threading.RLock()
+
+    def add(self, doc, text, fields):
+        with self.lock:
+            self.remove(doc)
+            counts = {}
+            tokens = tokenize(text)
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for term, tf in counts.items():
+                if term not in self.postings:
+                    self.postings[term] = {}
+                    bisect.insort(self.terms, term)
+                self.postings[term][doc] = tf
+            self.documents[doc] = fields
+            self.doc_terms[doc] = (counts, len(tokens))
+            self.total_length += len(tokens)
+
+    def remove(self, doc):
+        with self.lock:
+            entry = self.doc_terms.pop(doc, None)
+            if entry is None:
+                return
+            counts, length = entry
+            for term in counts:
+                postings = self.postings[term]
+                del postings[doc]
+                if not postings:
+                    del self.postings[term]
+                    del self.terms[bisect.bisect_left(self.terms, term)]
+            del self.documents[doc]
+            self.total_length -= length
+
+    def _prefixed(self, prefix, limit=50):
+        start = bisect.bisect_left(self.terms, prefix)
+        matches = []
+        for term in self.terms[start:start + limit]:
+            if not term.startswith(prefix):
+                break
+            matches.append(term)
+        return matches
+
+    def search(self, query, kind=None, limit=20):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        with self.lock:
+            count = len(self.doc_terms)
+            if not count:
+                return []
+            average = self.total_length / count
+            scores = {}
+            # The last token is still being typed, so it also matches longer terms.
+            groups = [[token] for token in tokens[:-1]] + [self._prefixed(tokens[-1]) or [tokens[-1]]]
+            for terms in groups:
+                for term in terms:
+                    postings = self.postings.get(term)
+                    if not postings:
+                        continue
+                    idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for doc, tf in postings.items():
+                        if kind and doc[0] != kind:
+                            continue
+                        length = self.doc_terms[doc][1]
+                        norm = tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * length / average))
+                        scores[doc] = scores.get(doc, 0.0) + idf * norm
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+            return [dict(self.documents[doc], type=doc[0], score=round(score, 4)) for doc, score in ranked]
+
+
+def _product_document(product_id, name, short_description):
+    fields = {'product_id': product_id, 'name': name, 'short_description': short_description}
+    return ('product', product_id), f'{name} {short_description or ""}', fields
+
+
+def _review_document(review_id, product_id, title, review_text):
+    fields = {'review_id': review_id, 'product_id': product_id, 'title': title}
+    return ('review', review_id), f'{title or ""} {review_text or ""}', fields
+
+
+def build_index():
+    index = InvertedIndex()
+    products = db.session.query(Product.product_id, Product.name, Product.short_description)
+    for row in products.yield_per(1000):
+        index.add(*_product_document(*row))
+    reviews = db.session.query(ProductReview.review_id, ProductReview.product_id, ProductReview.title, ProductReview.review_text)
+    for row in reviews.yield_per(1000):
+        index.add(*_review_document(*row))
+    return index
+
+
+_lock = threading.Lock()
+_index = None
+_built_at = 0.0
+# Set while a rebuild runs: the Event it signals when done, and the writes to replay onto its result.
+_build = None
+_pending = []
+_stale = False
+
+
+def _start_build(app):
+    global _build
+    _build = threading.Event()
+    threading.Thread(target=_rebuild, args=(app, _build), daemon=True).start()
+    return _build
+
+
+def _rebuild(app, done):
+    global _index, _built_at, _build, _stale
+    index = None
+    try:
+        with app.app_context():
+            index = build_index()
+    except Exception:
+        logger.exception('Search index rebuild failed')
+    with _lock:
+        if index is not None:
+            # Writes indexed while the rows were being read may be missing from the new index; replaying is idempotent.
+            for operation, args in _pending:
+                getattr(index, operation)(*args)
+            _index = index
+        _built_at = time.monotonic()
+        _pending.clear()
+        _build = None
+        if _stale:
+            _stale = False
+            _start_build(app)
+    done.set()
+
+
+def get_index():
+    # Rebuilds run in the background and are swapped in whole; requests keep reading the previous index meanwhile.
+    with _lock:
+        index, build = _index, _build
+        if build is None and (index is None or time.monotonic() - _built_at > current_app.config['SEARCH_INDEX_TTL']):
+            build = _start_build(current_app._get_current_object())
+    if index is None:
+        # Nothing to serve before the first build, so wait for it instead of starting another one.
+        build.wait()
+        index = _index
+    return index
+
+
+def _apply(operation, *args):
+    with _lock:
+        if _index is not None:
+            getattr(_index, operation)(*args)
+        if _build is not None:
+            _pending.append((operation, args))
+
+
+def index_product(product):
+    _apply('add', *_product_document(product.product_id, product.name, product.short_description))
+
+
+def index_review(review):
+    _apply('add', *_review_document(review.review_id, review.product_id, review.title, review.review_text))
+
+
+def remove(kind, id):
+    _apply('remove', (kind, id))
+
+
+def invalidate():
+    # A rebuild already running may have read or replayed the writes being undone, so it is followed by a fresh one.
+    global _stale
+    with _lock:
+        if _build is None:
+            _start_build(current_app._get_current_object())
+        else:
+            _stale = True
@@ -0,0 +1,102 @@
+import decimal
+import json
+import uuid
+from datetime import date
+
+from flask import current_app, json as flask_json
+from sqlalchemy import inspect
+from werkzeug.http import http_date
+
+from models import db, User, Post, Follow, Customer, Product, Category, ProductCategoryMap, Order, OrderItem, Shipment, Warehouse, ShipmentItem, ProductReview
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class InvalidFields(ValueError):
+    pass
+
+
+def _default(value):
+    # Dates keep the HTTP-date format Flask's encoder has always produced.
+    if isinstance(value, date):
+        return http_date(value)
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+class JSONEncoder(flask_json.JSONEncoder):
+    def default(self, o):
+        if isinstance(o, decimal.Decimal):
+            return float(o)
+        return super().default(o)
+
+
+def dumps(payload):
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default, option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def json_response(payload, status=200):
+    return current_app.response_class(dumps(payload), status=status, mimetype='application/json')
+
+
+class Serializer:
+    def __init__(self, model, default_fields, filters=()):
+        mapper = inspect(model)
+        self.model = model
+        self.attributes = {prop.key: getattr(model, prop.key) for prop in mapper.column_attrs}
+        self.nullable = {prop.key for prop in mapper.column_attrs if prop.columns[0].nullable}
+        self.primary_key = tuple(mapper.get_property_by_column(column).key for column in mapper.primary_key)
+        self.default_fields = tuple(default_fields)
+        self.filters = tuple(dict.fromkeys(self.primary_key + tuple(filters)))
+
+    def parse_fields(self, raw):
+        if not raw:
+            return self.default_fields
+        fields = tuple(dict.fromkeys(field.strip() for field in raw.split(',') if field.strip()))
+        unknown = [field for field in fields if field not in self.attributes]
+        if unknown:
+            raise InvalidFields(unknown)
+        return fields or self.default_fields
+
+    def columns(self, fields, sort=()):
+        # Requested fields come first so rows slice straight into dicts; sort keys and the primary key ride along for cursors.
+        extra = tuple(name for name in dict.fromkeys(tuple(sort) + self.primary_key) if name not in fields)
+        return [self.attributes[name] for name in fields + extra]
+
+    def query(self, fields, sort=()):
+        return db.session.query(*self.columns(fields, sort))
+
+    def dump(self, instance, fields=None):
+        return {name: getattr(instance, name) for name in fields or self.default_fields}
+
+
+SERIALIZERS = {serializer.model: serializer for serializer in (
+    Serializer(User, ('user_id', 'username', 'role', 'created_at'), filters=('username',)),
+    Serializer(Post, ('post_id', 'title', 'body', 'user_id', 'status', 'created_at'), filters=('user_id',)),
+    Serializer(Follow, ('following_user_id', 'followed_user_id', 'created_at'), filters=('followed_user_id',)),
+    Serializer(Customer, ('customer_id', 'username', 'email'), filters=('email',)),
+    Serializer(Product, ('product_id', 'name', 'short_description'), filters=('product_type_id',)),
+    Serializer(Category, ('category_id', 'meta_title', 'meta_description'), filters=('parent_category_id',)),
+    Serializer(ProductCategoryMap, ('map_id', 'product_id', 'category_id', 'is_featured_product', 'display_order'),
+               filters=('product_id', 'category_id', 'is_featured_product')),
+    Serializer(Order, ('order_id', 'customer_id', 'order_guid'), filters=('customer_id', 'store_id')),
+    Serializer(OrderItem, ('order_item_id', 'order_id', 'product_id', 'quantity'), filters=('order_id', 'product_id')),
+    Serializer(Shipment, ('shipment_id', 'order_id', 'tracking_number', 'total_weight', 'shipped_date_utc'), filters=('order_id', 'tracking_number')),
+    Serializer(Warehouse, ('warehouse_id', 'name', 'admin_comment')),
+    Serializer(ShipmentItem, ('shipment_item_id', 'shipment_id', 'order_item_id', 'warehouse_id'),
+               filters=('shipment_id', 'order_item_id', 'warehouse_id')),
+    Serializer(ProductReview, ('review_id', 'customer_id', 'product_id', 'is_approved', 'title', 'review_text'),
+               filters=('customer_id', 'product_id', 'is_approved')),
+)}
+
+
+def get_serializer(model):
+    return SERIALIZERS[model]
@@ -0,0 +1,32 @@
+import os
+import sys
+
+# The app reads its database from the environment at import time; tests run against in-memory SQLite.
+os.environ.setdefault('DATABASE_URI', 'sqlite://')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+import category_tree  # noqa: E402
+from app import app as flask_app  # noqa: E402
+from models import db  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    flask_app.config['TESTING'] = True
+    flask_app.config['ADMISSION_ENABLED'] = False
+    # Module-level caches outlive a test's database, so every test starts from empty ones.
+    category_tree.invalidate()
+    flask_app.extensions.pop('response_cache', None)
+    flask_app.extensions.pop('admission', None)
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
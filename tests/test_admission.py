@@ -0,0 +1,37 @@
+import pytest
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+import admission
+from config import Config
+
+
+@pytest.fixture
+def limited(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'ADMISSION_ENABLED', True)
+    monkeypatch.setitem(app.config, 'RATE_LIMIT_PER_SECOND', 0.001)
+    monkeypatch.setitem(app.config, 'RATE_LIMIT_BURST', 2)
+    return app
+
+
+def _statuses(client, address, count=3):
+    return [client.get('/orders/1/full', headers={'X-Forwarded-For': address}).status_code for _ in range(count)]
+
+
+def test_rate_limit_is_off_by_default(app):
+    assert Config.RATE_LIMIT_PER_SECOND == 0
+    assert Config.PROXY_FIX_X_FOR == 0
+    assert admission.Admission(app.config).buckets is None
+
+
+def test_forwarded_for_is_ignored_without_trusted_proxies(limited, client):
+    assert _statuses(client, '10.0.0.1') == [404, 404, 429]
+    # Every caller arrives from the proxy's address, so a second client finds the bucket already empty.
+    assert _statuses(client, '10.0.0.2', 1) == [429]
+
+
+def test_trusted_proxy_gives_each_client_its_own_bucket(limited, client, monkeypatch):
+    monkeypatch.setattr(limited, 'wsgi_app', ProxyFix(limited.wsgi_app, x_for=1))
+    assert _statuses(client, '10.0.0.1') == [404, 404, 429]
+    assert _statuses(client, '10.0.0.2') == [404, 404, 429]
+    # Only the last hop is trusted; addresses a client prepends itself are ignored.
+    assert _statuses(client, '10.0.0.3, 10.0.0.1', 1) == [429]
@@ -0,0 +1,98 @@
+import uuid
+
+import pytest
+
+import batch
+from models import db, ChangeLog, Customer, Order, OrderItem, Product, ProductStats
+
+
+def _operations(last=None):
+    operations = [
+        {'method': 'POST', 'path': '/customers', 'ref': 'customer',
+         'body': {'customer_guid': str(uuid.uuid4()), 'username': 'c', 'email': 'c@example.com'}},
+        {'method': 'POST', 'path': '/orders', 'ref': 'order',
+         'body': {'order_guid': str(uuid.uuid4()), 'store_id': 1, 'customer_id': '$customer.customer_id',
+                  'billing_address_id': 1, 'shipping_address_id': 1}},
+        {'method': 'POST', 'path': '/order_items',
+         'body': {'order_item_guid': str(uuid.uuid4()), 'order_id': '$order.order_id', 'product_id': 1, 'quantity': 2}},
+        {'method': 'PATCH', 'path': '/customers/$customer.customer_id', 'body': {'email': 'd@example.com'}},
+        {'method': 'PATCH', 'path': '/order_items/$2.order_item_id', 'body': {'quantity': 3}},
+    ]
+    return operations + ([last] if last else [])
+
+
+@pytest.fixture
+def settled(monkeypatch):
+    calls = []
+    settle = batch._settle_side_effects
+
+    def spy(written, committed):
+        # in_transaction() turns false only once the batch's transaction has been committed or rolled back.
+        calls.append((written, committed, db.session().in_transaction(), Customer.query.count()))
+        settle(written, committed)
+
+    monkeypatch.setattr(batch, '_settle_side_effects', spy)
+    return calls
+
+
+def _seed():
+    db.session.add(Product(product_type_id=1, name='p'))
+    db.session.commit()
+
+
+def test_references_resolve_in_paths_and_bodies(client, settled):
+    _seed()
+    response = client.post('/batch', json=_operations())
+    assert response.status_code == 200
+    assert [result['status'] for result in response.json['results']] == [201, 201, 201, 200, 200]
+
+    customer = Customer.query.one()
+    order = Order.query.one()
+    item = OrderItem.query.one()
+    assert (order.customer_id, item.order_id) == (customer.customer_id, order.order_id)
+    assert (customer.email, item.quantity) == ('d@example.com', 3)
+    assert db.session.get(ProductStats, 1).units_sold == 3
+    assert settled == [({'customers', 'orders', 'order_items'}, True, False, 1)]
+
+
+@pytest.mark.parametrize('last, status', [
+    ({'method': 'PUT', 'path': '/customers/99', 'body': {'username': 'x', 'email': 'x@example.com'}}, 404),
+    ({'method': 'PATCH', 'path': '/order_items/$2.order_item_id', 'body': {'quantity': 'many'}}, 400),
+    ({'method': 'PATCH', 'path': '/customers/$nobody.customer_id', 'body': {'email': 'x@example.com'}}, 400),
+])
+def test_a_failing_operation_rolls_back_the_whole_batch(client, settled, last, status):
+    _seed()
+    seq = db.session.query(db.func.max(ChangeLog.seq)).scalar()
+
+    response = client.post('/batch', json=_operations(last))
+    assert response.status_code == status
+    assert response.json['failed'] == 5
+    assert len(response.json['results']) == 6
+
+    assert (Customer.query.count(), Order.query.count(), OrderItem.query.count()) == (0, 0, 0)
+    assert ProductStats.query.count() == 0
+    assert db.session.query(db.func.max(ChangeLog.seq)).scalar() == seq
+    assert [(committed, active, customers) for _, committed, active, customers in settled] == [(False, False, 0)]
+
+
+def test_invalid_operations_are_rejected_before_running(client, settled):
+    response = client.post('/batch', json=_operations({'method': 'GET', 'path': '/customers'}))
+    assert response.status_code == 400
+    assert response.json['message'] == 'Operaciones inválidas: 5'
+    assert Customer.query.count() == 0
+    assert settled == []
+
+
+@pytest.mark.parametrize('operations, expected', [
+    (_operations()[3:4], 'light'),
+    (_operations()[3:5], 'standard'),
+    (_operations()[:3], 'heavy'),
+    ([{'method': 'POST', 'path': '/order_items/bulk', 'body': []}], 'heavy'),
+    ([{'method': 'DELETE', 'path': '/nowhere/1'}], 'light'),
+    ([{'method': 'GET', 'path': '/customers'}], 'light'),
+    ({'method': 'PATCH', 'path': '/customers/1'}, 'light'),
+    ([_operations()[3]] * 101, 'light'),
+])
+def test_batch_cost_follows_its_operations(app, operations, expected):
+    with app.test_request_context('/batch', method='POST', json=operations):
+        assert batch.cost() == expected
@@ -0,0 +1,102 @@
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+
+import archive
+from models import (db, ArchivedOrder, ArchivedOrderItem, ArchivedShipment, ArchivedShipmentItem, Customer, Order,
+                    OrderItem, Product, ProductReview, Shipment, ShipmentItem, Warehouse)
+
+SHIPPED = datetime.utcnow() - timedelta(days=400)
+
+
+def _order(customer_id, store_id, shipped=True):
+    order = Order(order_guid=str(uuid.uuid4()), store_id=store_id, customer_id=customer_id)
+    db.session.add(order)
+    db.session.flush()
+    items = [OrderItem(order_item_guid=str(uuid.uuid4()), order_id=order.order_id, product_id=1, quantity=1) for _ in range(2)]
+    shipment = Shipment(order_id=order.order_id, shipped_date_utc=SHIPPED)
+    db.session.add_all([*items, shipment])
+    db.session.flush()
+    db.session.add_all([ShipmentItem(shipment_id=shipment.shipment_id, order_item_id=item.order_item_id, warehouse_id=1)
+                        for item in items if shipped])
+    return order, items, shipment
+
+
+def _seed():
+    # Per customer: an archived order, a shipped one, and one left out of its own shipment.
+    # Order 3's items went out in order 5's shipment instead, tying the two customers together; order 6's never did.
+    db.session.add_all([Customer(username='c', email='c@example.com'), Customer(username='d', email='d@example.com'),
+                        Product(product_type_id=1, name='p'), Warehouse(name='w')])
+    db.session.flush()
+    orders = {}
+    for customer_id in (1, 2):
+        for position in range(3):
+            orders[len(orders) + 1] = _order(customer_id, len(orders), shipped=position < 2)
+        db.session.add(ProductReview(customer_id=customer_id, product_id=1, is_approved=True, title='t', review_text='r'))
+    _, crossing, _ = orders[3]
+    _, _, carrier = orders[5]
+    db.session.add_all([ShipmentItem(shipment_id=carrier.shipment_id, order_item_id=item.order_item_id, warehouse_id=1)
+                        for item in crossing])
+    db.session.commit()
+    archive.move([1, 4])
+    db.session.commit()
+
+
+def _orphans():
+    # Every foreign key in the schema, hot and archived tables alike, must point at an existing row.
+    orphans = {}
+    for table in db.metadata.sorted_tables:
+        for fk in table.foreign_keys:
+            missing = (select(func.count()).select_from(table)
+                       .where(fk.parent.isnot(None), fk.parent.notin_(select(fk.column))))
+            count = db.session.execute(missing).scalar()
+            if count:
+                orphans[f'{table.name}.{fk.parent.name}'] = count
+    return orphans
+
+
+def _counts():
+    return {model.__tablename__: model.query.count()
+            for model in (Order, OrderItem, Shipment, ShipmentItem, ProductReview,
+                          ArchivedOrder, ArchivedOrderItem, ArchivedShipment, ArchivedShipmentItem)}
+
+
+@pytest.mark.parametrize('path', ['/customers/1', '/customers/2', '/orders/3', '/orders/5',
+                                  '/order_items/5', '/order_items/9', '/shipments/5'])
+def test_cascade_deletes_leave_no_orphans(client, path):
+    _seed()
+    assert _orphans() == {}
+    before = _counts()
+
+    assert client.delete(path).status_code == 200
+    assert _orphans() == {}
+    assert _counts() != before
+    assert client.delete(path).status_code == 404
+
+
+def test_deleting_a_customer_keeps_the_other_customers_rows(client):
+    _seed()
+    assert client.delete('/customers/1').status_code == 200
+    assert [customer.customer_id for customer in Customer.query] == [2]
+    assert {order.customer_id for order in Order.query} == {2}
+    assert [order.order_id for order in ArchivedOrder.query] == [4]
+    assert {review.customer_id for review in ProductReview.query} == {2}
+    # Order 5's shipment loses the items of order 3 and keeps its own.
+    assert sorted(item.order_item_id for item in ShipmentItem.query.filter_by(shipment_id=5)) == [9, 10]
+
+
+def test_orders_sharing_a_shipment_are_not_archived(client):
+    _seed()
+    # 2 is shipped in full; 3 and 5 share shipment 5; 6 is unshipped.
+    assert archive._eligible(0, 100, datetime.utcnow()) == [2]
+    assert archive._eligible(0, 100, SHIPPED) == []
+    assert archive.archive_orders(days=30) == 1
+    assert _orphans() == {}
+    assert sorted(order.order_id for order in Order.query) == [3, 5, 6]
+
+    # Once the tie is gone both sides qualify on their own.
+    assert client.delete('/order_items/5').status_code == 200
+    assert client.delete('/order_items/6').status_code == 200
+    assert archive._eligible(0, 100, datetime.utcnow()) == [3, 5]
@@ -0,0 +1,47 @@
+import sys
+
+from category_tree import CategoryTree
+from models import db, Category
+
+
+def _chain(depth):
+    return [(index, index - 1 if index > 1 else None, f'c{index}') for index in range(1, depth + 1)]
+
+
+def test_as_tree_handles_chains_deeper_than_the_recursion_limit():
+    depth = sys.getrecursionlimit() + 100
+    roots = CategoryTree(_chain(depth)).as_tree()
+
+    seen = []
+    nodes = roots
+    while nodes:
+        assert len(nodes) == 1
+        seen.append(nodes[0]['category_id'])
+        nodes = nodes[0]['children']
+    assert seen == list(range(1, depth + 1))
+
+
+def test_category_tree_route_serves_a_deep_chain(client):
+    depth = sys.getrecursionlimit() + 100
+    db.session.execute(Category.__table__.insert(), [
+        {'category_id': category_id, 'parent_category_id': parent_id, 'meta_title': title, 'meta_description': ''}
+        for category_id, parent_id, title in _chain(depth)])
+    db.session.commit()
+
+    response = client.get('/categories/tree')
+
+    assert response.status_code == 200
+    body = response.get_data(as_text=True)
+    assert body.count('"category_id"') == depth
+    assert body.startswith('[{"category_id":1,"children":[{"category_id":2,')
+    assert body.endswith('"meta_title":"c1"}]')
+
+
+def test_as_tree_keeps_siblings_in_order_and_breaks_cycles():
+    rows = [(1, None, 'root'), (3, 1, 'b'), (2, 1, 'a'), (4, 2, 'a1'), (5, 6, 'x'), (6, 5, 'y')]
+    tree = CategoryTree(rows).as_tree()
+
+    assert [node['category_id'] for node in tree] == [1, 5]
+    assert [child['category_id'] for child in tree[0]['children']] == [2, 3]
+    assert tree[0]['children'][0]['children'][0]['category_id'] == 4
+    assert tree[1]['children'][0]['category_id'] == 6
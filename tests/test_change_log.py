@@ -0,0 +1,121 @@
+import uuid
+from datetime import datetime, timedelta
+
+import archive
+import change_log
+from models import db, ChangeLog, Customer, Order, OrderItem, Product, Shipment, ShipmentItem, User, Warehouse
+
+
+def _age(days=0, seconds=0):
+    table = ChangeLog.__table__
+    created_at = datetime.utcnow() - timedelta(days=days, seconds=seconds)
+    db.session.execute(table.update().values(created_at=created_at))
+    db.session.commit()
+
+
+def _users(*names):
+    users = [User(username=name) for name in names]
+    db.session.add_all(users)
+    db.session.commit()
+    return [user.user_id for user in users]
+
+
+def test_unsettled_entries_are_held_back_with_retry_after(client):
+    _users('a')
+    response = client.get('/changes?since=0')
+    assert response.status_code == 200
+    assert response.json['changes'] == {}
+    assert response.json['next_since'] == 0
+    assert response.json['has_more'] is False
+    assert 1 <= response.json['retry_after'] <= 5
+
+    _age(seconds=10)
+    response = client.get('/changes?since=0')
+    assert response.json['retry_after'] is None
+    assert response.json['next_since'] == 1
+    assert [user['username'] for user in response.json['changes']['users']['upserted']] == ['a']
+
+
+def test_settled_prefix_is_served_and_watermark_stops_before_fresh_entries(client):
+    _users('a', 'b')
+    _age(seconds=10)
+    _users('c')
+
+    response = client.get('/changes?since=0&limit=1')
+    assert (response.json['next_since'], response.json['has_more'], response.json['retry_after']) == (1, True, None)
+
+    # The fresh entry ends the page even though it fits, so has_more cannot send the caller into a busy loop.
+    response = client.get('/changes?since=1')
+    assert response.json['next_since'] == 2
+    assert response.json['has_more'] is False
+    assert response.json['retry_after'] is not None
+    assert [user['username'] for user in response.json['changes']['users']['upserted']] == ['b']
+
+
+def test_latest_operation_wins_and_deleted_rows_are_reported(client, app, monkeypatch):
+    monkeypatch.setitem(app.config, 'CHANGE_LOG_SETTLE_SECONDS', 0)
+    kept, removed = _users('a', 'b')
+    db.session.get(User, kept).username = 'a2'
+    db.session.delete(db.session.get(User, removed))
+    db.session.commit()
+
+    response = client.get('/changes?since=0&tables=users')
+    assert response.json['next_since'] == 4
+    users = response.json['changes']['users']
+    assert [(user['user_id'], user['username']) for user in users['upserted']] == [(kept, 'a2')]
+    assert users['archived'] == []
+    assert users['deleted'] == [{'user_id': removed}]
+
+
+def test_pruned_history_answers_410(client):
+    _users('a', 'b', 'c')
+    _age(days=8)
+    _users('d')
+
+    # The newest expired entry survives, so the watermark sits one below it.
+    assert change_log.prune() == 2
+    assert change_log.pruned_through() == 2
+    assert client.get('/changes?since=0').status_code == 410
+    assert client.get('/changes?since=1').status_code == 410
+    response = client.get('/changes?since=2')
+    assert response.status_code == 200
+    assert response.json['next_since'] == 3
+    assert change_log.prune() == 0
+
+
+def test_compact_keeps_only_the_latest_entry_per_row(client):
+    user_id, = _users('a')
+    for name in ('b', 'c'):
+        db.session.get(User, user_id).username = name
+        db.session.commit()
+    _users('d')
+    _age(seconds=10)
+    before = client.get('/changes?since=0').json['changes']
+
+    assert change_log.compact() == 2
+    assert db.session.query(ChangeLog.seq).order_by(ChangeLog.seq).all() == [(3,), (4,)]
+    assert client.get('/changes?since=0').json['changes'] == before
+
+
+def test_archived_orders_are_logged_as_archived(client):
+    db.session.add_all([Customer(username='c', email='c@example.com'), Product(product_type_id=1, name='p'), Warehouse(name='w')])
+    db.session.flush()
+    order = Order(order_guid=str(uuid.uuid4()), store_id=1, customer_id=1)
+    db.session.add(order)
+    db.session.flush()
+    item = OrderItem(order_item_guid=str(uuid.uuid4()), order_id=order.order_id, product_id=1, quantity=1)
+    shipment = Shipment(order_id=order.order_id, shipped_date_utc=datetime.utcnow() - timedelta(days=400))
+    db.session.add_all([item, shipment])
+    db.session.flush()
+    db.session.add(ShipmentItem(shipment_id=shipment.shipment_id, order_item_id=item.order_item_id, warehouse_id=1))
+    db.session.commit()
+    seeded = db.session.query(db.func.max(ChangeLog.seq)).scalar()
+
+    assert archive.archive_orders(days=30) == 1
+    assert {entry.operation for entry in ChangeLog.query.filter(ChangeLog.seq > seeded)} == {change_log.ARCHIVE}
+    _age(seconds=10)
+
+    changes = client.get('/changes?since=0&tables=orders,order_items,shipments,shipment_items').json['changes']
+    for table_name, key in (('orders', 'order_id'), ('order_items', 'order_item_id'),
+                            ('shipments', 'shipment_id'), ('shipment_items', 'shipment_item_id')):
+        assert changes[table_name] == {'upserted': [], 'archived': [{key: 1}], 'deleted': []}
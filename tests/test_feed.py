@@ -0,0 +1,42 @@
+import base64
+import json
+from datetime import datetime, timedelta
+
+from models import db, Follow, Post, User
+
+
+def _cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def _seed():
+    db.session.add_all([User(username=f'u{index}') for index in range(1, 5)])
+    db.session.flush()
+    db.session.add_all([Follow(following_user_id=1, followed_user_id=author) for author in (2, 3, 4)])
+    start = datetime(2026, 1, 1)
+    for index in range(16):
+        # Every other pair shares a timestamp, so the post_id tie-break is exercised.
+        db.session.add(Post(title=f'p{index}', body='', user_id=index % 4 + 1, status='x', created_at=start + timedelta(minutes=index // 2)))
+    db.session.commit()
+
+
+def test_feed_pages_merge_followed_authors_newest_first(client):
+    _seed()
+    expected = [post.title for post in Post.query.filter(Post.user_id != 1).order_by(Post.created_at.desc(), Post.post_id.desc())]
+
+    titles, cursor = [], None
+    while True:
+        response = client.get('/users/1/feed?limit=5' + (f'&cursor={cursor}' if cursor else ''))
+        assert response.status_code == 200
+        titles += [post['title'] for post in response.json['items']]
+        cursor = response.json['next_cursor']
+        if not cursor:
+            break
+
+    assert titles == expected
+
+
+def test_feed_rejects_malformed_cursors(client):
+    _seed()
+    for values in (['2020-01-01T00:00:00', {'a': 1}], ['not a date', 1], [1]):
+        assert client.get(f'/users/1/feed?cursor={_cursor(values)}').status_code == 400
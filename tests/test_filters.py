@@ -0,0 +1,110 @@
+import base64
+import json
+import uuid
+
+import pytest
+
+from filters import MAX_IN_VALUES
+from models import db, Customer, Order, Shipment
+
+# Duplicates and NULLs so a sort on tracking_number needs the primary key to break ties.
+TRACKING = ('b', None, 'a', 'b', None, 'c', 'a', None, 'b')
+
+
+def _cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def _seed():
+    db.session.add(Customer(username='c', email='c@example.com'))
+    db.session.flush()
+    for store_id in range(3):
+        db.session.add(Order(order_guid=str(uuid.uuid4()), store_id=store_id, customer_id=1))
+    db.session.flush()
+    for position, tracking_number in enumerate(TRACKING):
+        db.session.add(Shipment(order_id=position % 3 + 1, tracking_number=tracking_number))
+    db.session.commit()
+
+
+def _ids(client, query):
+    response = client.get('/shipments?' + query)
+    assert response.status_code == 200
+    return [shipment['shipment_id'] for shipment in response.json]
+
+
+def _walk(client, query):
+    ids, cursor = [], None
+    while True:
+        response = client.get(f'/shipments?{query}&limit=2' + (f'&cursor={cursor}' if cursor else ''))
+        assert response.status_code == 200
+        ids += [shipment['shipment_id'] for shipment in response.json['items']]
+        cursor = response.json['next_cursor']
+        if not cursor:
+            return ids
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('order_id=2', [2, 5, 8]),
+    ('order_id__eq=2', [2, 5, 8]),
+    ('order_id__ne=2', [1, 3, 4, 6, 7, 9]),
+    ('order_id__gt=2', [3, 6, 9]),
+    ('order_id__gte=2', [2, 3, 5, 6, 8, 9]),
+    ('order_id__lt=2', [1, 4, 7]),
+    ('order_id__lte=2', [1, 2, 4, 5, 7, 8]),
+    ('order_id__in=1,3', [1, 3, 4, 6, 7, 9]),
+    ('tracking_number__isnull=true', [2, 5, 8]),
+    ('tracking_number__isnull=0', [1, 3, 4, 6, 7, 9]),
+])
+def test_filter_operators(client, query, expected):
+    _seed()
+    assert sorted(_ids(client, query)) == expected
+
+
+@pytest.mark.parametrize('query, message', [
+    ('carrier=x', 'Filtro inválido: carrier'),
+    ('order_id__like=1', 'Filtro inválido: order_id__like'),
+    ('order_id=abc', 'Filtro inválido: order_id'),
+    ('order_id__gt=', 'Filtro inválido: order_id__gt'),
+    ('order_id__in=', 'Filtro inválido: order_id__in'),
+    ('order_id__in=,,', 'Filtro inválido: order_id__in'),
+    ('order_id__in=' + ','.join(['1'] * (MAX_IN_VALUES + 1)), 'Filtro inválido: order_id__in'),
+    ('tracking_number__isnull=maybe', 'Filtro inválido: tracking_number__isnull'),
+    ('sort=total_weight', 'Filtro inválido: sort'),
+    ('sort=-', 'Filtro inválido: sort'),
+    ('fields=shipment_id,carrier', 'Campos desconocidos: carrier'),
+])
+def test_invalid_queries_are_rejected(client, query, message):
+    _seed()
+    response = client.get('/shipments?' + query)
+    assert response.status_code == 400
+    assert response.json['message'] == message
+
+
+@pytest.mark.parametrize('cursor', [
+    'not-base64!',
+    _cursor({'shipment_id': 1}),
+    _cursor([1]),
+    _cursor(['x', 'y']),
+    _cursor([None, None]),
+])
+def test_invalid_cursors_are_rejected(client, cursor):
+    _seed()
+    response = client.get(f'/shipments?sort=tracking_number&cursor={cursor}')
+    assert response.status_code == 400
+    assert response.json['message'] == 'Cursor inválido'
+
+
+def test_pages_on_a_nullable_sort_cover_every_row_once(client):
+    _seed()
+    by_id = dict(enumerate(TRACKING, start=1))
+    present = sorted((number, shipment_id) for shipment_id, number in by_id.items() if number is not None)
+    missing = sorted(shipment_id for shipment_id, number in by_id.items() if number is None)
+
+    # NULLs come last in both directions, with the primary key ascending as the tie-breaker.
+    ascending = [shipment_id for _, shipment_id in present] + missing
+    descending = [shipment_id for _, shipment_id in sorted(present, key=lambda pair: (-ord(pair[0]), pair[1]))] + missing
+    assert _walk(client, 'sort=tracking_number') == ascending
+    assert _walk(client, 'sort=-tracking_number') == descending
+    assert _walk(client, 'sort=-tracking_number') == _ids(client, 'sort=-tracking_number')
+    assert _walk(client, 'sort=tracking_number&order_id__ne=2') == [shipment_id for shipment_id in ascending
+                                                                      if shipment_id % 3 != 2]
@@ -0,0 +1,46 @@
+import base64
+import json
+import uuid
+
+from models import db, Customer, Order, OrderItem, Product, Shipment, ShipmentItem, Warehouse
+
+
+def _cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def _seed():
+    db.session.add_all([Customer(username='c', email='c@example.com'), Product(product_type_id=1, name='p'), Warehouse(name='w')])
+    db.session.flush()
+    for store_id in range(6):
+        order = Order(order_guid=str(uuid.uuid4()), store_id=store_id, customer_id=1)
+        db.session.add(order)
+        db.session.flush()
+        item = OrderItem(order_item_guid=str(uuid.uuid4()), order_id=order.order_id, product_id=1, quantity=1)
+        shipment = Shipment(order_id=order.order_id, tracking_number=f't{store_id}')
+        db.session.add_all([item, shipment])
+        db.session.flush()
+        # Even stores are shipped in full.
+        if store_id % 2 == 0:
+            db.session.add(ShipmentItem(shipment_id=shipment.shipment_id, order_item_id=item.order_item_id, warehouse_id=1))
+    db.session.commit()
+
+
+def test_unfulfilled_pages_skip_shipped_orders(client):
+    _seed()
+    ids, cursor = [], None
+    while True:
+        response = client.get('/orders/unfulfilled?limit=2' + (f'&cursor={cursor}' if cursor else ''))
+        assert response.status_code == 200
+        ids += [order['order_id'] for order in response.json['items']]
+        cursor = response.json['next_cursor']
+        if not cursor:
+            break
+
+    assert ids == [2, 4, 6]
+
+
+def test_unfulfilled_rejects_malformed_cursors(client):
+    _seed()
+    for values in ([{'a': 1}], ['x'], [None], [1, 2]):
+        assert client.get(f'/orders/unfulfilled?cursor={_cursor(values)}').status_code == 400
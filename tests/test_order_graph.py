@@ -0,0 +1,65 @@
+import uuid
+
+import pytest
+from sqlalchemy import event
+
+from models import db, Customer, Order, OrderItem, Product, Shipment, ShipmentItem, Warehouse
+
+# Orders with their customer, items with products, shipments, and shipment items with warehouses.
+MAX_QUERIES = 4
+
+
+@pytest.fixture
+def orders(app):
+    customer = Customer(customer_guid=str(uuid.uuid4()), username='c', email='c@example.com')
+    warehouse = Warehouse(name='w', admin_comment='')
+    products = [Product(product_type_id=1, name=f'p{index}') for index in range(3)]
+    db.session.add_all([customer, warehouse, *products])
+    db.session.flush()
+    ids = []
+    for store_id in range(5):
+        order = Order(order_guid=str(uuid.uuid4()), store_id=store_id, customer_id=customer.customer_id,
+                      billing_address_id=1, shipping_address_id=1)
+        db.session.add(order)
+        db.session.flush()
+        shipment = Shipment(order_id=order.order_id, tracking_number=f't{store_id}', total_weight=1)
+        db.session.add(shipment)
+        for product in products:
+            item = OrderItem(order_item_guid=str(uuid.uuid4()), order_id=order.order_id, product_id=product.product_id, quantity=1)
+            db.session.add(item)
+            db.session.flush()
+            db.session.add(ShipmentItem(shipment_id=shipment.shipment_id, order_item_id=item.order_item_id,
+                                        warehouse_id=warehouse.warehouse_id))
+        ids.append(order.order_id)
+    db.session.commit()
+    db.session.remove()
+    return ids
+
+
+@pytest.fixture
+def statements(app):
+    issued = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        issued.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    yield issued
+    event.remove(db.engine, 'before_cursor_execute', count)
+
+
+def test_single_order_graph_query_count(client, orders, statements):
+    response = client.get(f'/orders/{orders[0]}/full')
+
+    assert response.status_code == 200
+    assert len(response.json['order_items']) == 3
+    assert len(response.json['shipments'][0]['shipment_items']) == 3
+    assert len(statements) <= MAX_QUERIES
+
+
+def test_order_graph_query_count_does_not_grow_with_orders(client, orders, statements):
+    response = client.get('/orders/full?ids=' + ','.join(map(str, orders)))
+
+    assert response.status_code == 200
+    assert [order['order_id'] for order in response.json] == orders
+    assert len(statements) <= MAX_QUERIES
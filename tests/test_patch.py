@@ -0,0 +1,81 @@
+import uuid
+
+import pytest
+
+from models import db, ChangeLog, Customer, Order, OrderItem, Product, ProductStats, User
+
+
+def _seed():
+    db.session.add_all([User(username='u'), Customer(username='c', email='c@example.com'), Product(product_type_id=1, name='p')])
+    db.session.flush()
+    order = Order(order_guid=str(uuid.uuid4()), store_id=1, customer_id=1)
+    db.session.add(order)
+    db.session.flush()
+    db.session.add(OrderItem(order_item_guid=str(uuid.uuid4()), order_id=order.order_id, product_id=1, quantity=2))
+    db.session.commit()
+
+
+def _updates(table_name):
+    return ChangeLog.query.filter_by(table_name=table_name, operation='U').count()
+
+
+@pytest.mark.parametrize('path, body', [('/users/{}', {'role': 'admin'}), ('/order_items/{}', {'quantity': 5})])
+def test_if_match_guards_the_update(client, path, body):
+    _seed()
+    response = client.patch(path.format(1), json=body, headers={'If-Match': '"1"'})
+    assert response.status_code == 200
+    assert (response.json['version'], response.headers['ETag']) == (2, '"2"')
+
+    response = client.patch(path.format(1), json=body, headers={'If-Match': '"1"'})
+    assert response.status_code == 412
+    assert client.patch(path.format(1), json=body, headers={'If-Match': '"3", "2"'}).status_code == 200
+    assert client.patch(path.format(1), json=body, headers={'If-Match': '*'}).status_code == 200
+    assert client.patch(path.format(1), json=body).status_code == 200
+
+
+@pytest.mark.parametrize('path, body', [('/users/{}', {'role': 'admin'}), ('/order_items/{}', {'quantity': 5})])
+def test_missing_rows_are_404_even_with_if_match(client, path, body):
+    _seed()
+    assert client.patch(path.format(99), json=body).status_code == 404
+    response = client.patch(path.format(99), json=body, headers={'If-Match': '"1"'})
+    assert response.status_code == 404
+    assert response.json['message'] in ('Usuario no encontrado', 'Item de pedido no encontrado')
+
+
+@pytest.mark.parametrize('body, message', [
+    ([], 'Cuerpo JSON inválido'),
+    ({}, 'Sin campos para actualizar'),
+    ({'username': 'x', 'created_at': 'now', 'version': 9}, 'Campos no modificables: created_at, version'),
+])
+def test_invalid_bodies_are_rejected(client, body, message):
+    _seed()
+    response = client.patch('/users/1', json=body)
+    assert response.status_code == 400
+    assert response.json['message'] == message
+    assert db.session.get(User, 1).username == 'u'
+
+
+def test_core_path_updates_and_logs_one_change(client):
+    _seed()
+    updates = _updates('users')
+    assert client.patch('/users/1', json={'username': 'v'}).status_code == 200
+    user = db.session.get(User, 1)
+    assert (user.username, user.version) == ('v', 2)
+    assert _updates('users') == updates + 1
+
+
+def test_counter_fields_go_through_the_orm_and_move_product_stats(client):
+    _seed()
+    assert db.session.get(ProductStats, 1).units_sold == 2
+    updates = _updates('order_items')
+
+    assert client.patch('/order_items/1', json={'quantity': 7}, headers={'If-Match': '"1"'}).status_code == 200
+    db.session.expire_all()
+    assert db.session.get(ProductStats, 1).units_sold == 7
+    assert _updates('order_items') == updates + 1
+
+    # A stale or invalid write leaves the counters where they were.
+    assert client.patch('/order_items/1', json={'quantity': 9}, headers={'If-Match': '"1"'}).status_code == 412
+    assert client.patch('/order_items/1', json={'quantity': 'lots'}).status_code == 400
+    db.session.expire_all()
+    assert (db.session.get(OrderItem, 1).quantity, db.session.get(ProductStats, 1).units_sold) == (7, 7)
@@ -0,0 +1,103 @@
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+import archive
+import product_stats
+from models import db, Customer, Order, OrderItem, Product, ProductStats, Shipment, ShipmentItem, Warehouse
+
+
+def _guid():
+    return str(uuid.uuid4())
+
+
+def _seed():
+    db.session.add_all([Customer(username='c', email='c@example.com'), Customer(username='d', email='d@example.com'),
+                        Warehouse(name='w')])
+    db.session.add_all([Product(product_type_id=1, name=f'p{index}') for index in range(4)])
+    db.session.flush()
+    db.session.add_all([Order(order_guid=_guid(), store_id=store_id, customer_id=store_id % 2 + 1) for store_id in range(4)])
+    db.session.commit()
+
+
+def _stats():
+    db.session.expire_all()
+    # rebuild() only writes products with sales or reviews; incremental upkeep can leave them at zero instead.
+    return sorted((stats.product_id, stats.units_sold, stats.review_count, stats.approved_review_count)
+                  for stats in ProductStats.query if stats.units_sold or stats.review_count)
+
+
+def _item(client, order_id, product_id, quantity):
+    response = client.post('/order_items', json={'order_item_guid': _guid(), 'order_id': order_id,
+                                                 'product_id': product_id, 'quantity': quantity})
+    assert response.status_code == 201
+    return response.json['order_item_id']
+
+
+def _review(client, customer_id, product_id, approved):
+    response = client.post('/product_reviews', json={'customer_id': customer_id, 'product_id': product_id,
+                                                     'is_approved': approved, 'title': 't', 'review_text': 'r'})
+    assert response.status_code == 201
+    return response.json['review_id']
+
+
+def test_incremental_counters_match_a_rebuild(client):
+    _seed()
+    first = _item(client, 1, 1, 3)
+    second = _item(client, 2, 1, '2')
+    third = _item(client, 3, 2, 4)
+    shipped = _item(client, 2, 3, 1)
+    response = client.post('/order_items/bulk', json=[
+        {'order_item_guid': _guid(), 'order_id': 4, 'product_id': 2, 'quantity': 5},
+        {'order_item_guid': _guid(), 'order_id': 4, 'product_id': 3, 'quantity': '6'},
+        {'order_item_guid': _guid(), 'order_id': 1, 'product_id': 4, 'quantity': 7},
+    ])
+    assert response.json['created'] == 3
+    approved = _review(client, 1, 1, True)
+    _review(client, 2, 1, False)
+    pending = _review(client, 2, 4, False)
+
+    assert client.put(f'/order_items/{first}', json={'quantity': 8}).status_code == 200
+    assert client.patch(f'/order_items/{second}', json={'quantity': 1}).status_code == 200
+    assert client.patch(f'/product_reviews/{pending}', json={'is_approved': True}).status_code == 200
+    assert client.put(f'/product_reviews/{approved}', json={'is_approved': False, 'title': 't', 'review_text': 'r'}).status_code == 200
+    assert client.delete(f'/order_items/{third}').status_code == 200
+    assert client.delete(f'/product_reviews/{approved}').status_code == 200
+
+    # Order 2 is shipped long ago and archived; its items keep counting until its customer is deleted.
+    shipment = Shipment(order_id=2, shipped_date_utc=datetime.utcnow() - timedelta(days=400))
+    db.session.add(shipment)
+    db.session.flush()
+    db.session.add_all([ShipmentItem(shipment_id=shipment.shipment_id, order_item_id=item_id, warehouse_id=1)
+                        for item_id in (second, shipped)])
+    db.session.commit()
+    assert archive.archive_orders(days=30) == 1
+
+    incremental = _stats()
+    assert incremental == [(1, 9, 1, 0), (2, 5, 0, 0), (3, 7, 0, 0), (4, 7, 1, 1)]
+    product_stats.rebuild()
+    assert _stats() == incremental
+
+    # Customer 1 owns orders 1 and 3; customer 2 owns order 2 (archived), order 4 and the remaining reviews.
+    assert client.delete('/orders/3').status_code == 200
+    assert client.delete('/customers/2').status_code == 200
+    incremental = _stats()
+    assert incremental == [(1, 8, 0, 0), (4, 7, 0, 0)]
+    product_stats.rebuild()
+    assert _stats() == incremental
+
+
+@pytest.mark.parametrize('method, path, body', [
+    ('post', '/order_items', {'order_item_guid': 'f1c8a0c2-0d6e-4e53-9a3c-6a0c6c2f9a11', 'order_id': 1, 'product_id': 1, 'quantity': 'x'}),
+    ('put', '/order_items/{}', {'quantity': [1]}),
+    ('patch', '/order_items/{}', {'quantity': '2.5'}),
+])
+def test_invalid_quantities_are_rejected(client, method, path, body):
+    _seed()
+    item_id = _item(client, 1, 1, 3)
+    response = getattr(client, method)(path.format(item_id), json=body)
+    assert response.status_code == 400
+    assert response.json['message'] == 'Cantidad inválida'
+    assert OrderItem.query.count() == 1
+    assert _stats() == [(1, 3, 0, 0)]